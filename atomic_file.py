@@ -0,0 +1,21 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Atomic file replacement for the on-disk caches, which the app's sessions and the batch runner's
+# worker processes all write. Each writer gets its own temp file beside the target (named by pid
+# and thread), so two concurrent writers never share one, and os.replace publishes it whole.
+
+
+@contextmanager
+def atomic_write(path, mode="wb", **kwargs):
+	"""open() a private temp file for writing; on a clean exit it replaces path, otherwise it is removed."""
+	path = Path(path)
+	tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+	try:
+		with open(tmp, mode, **kwargs) as f:
+			yield f
+		os.replace(tmp, path)
+	finally:
+		tmp.unlink(missing_ok=True)
@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Process-wide background jobs for slow loads the app should not block a rerun on (the room-rate
+# export, the Drive manifest crawl, history ingests). Jobs are keyed: while one runs, reruns get the
+# same Future back instead of starting another, and a failed job is only restarted after
+# RETRY_SECONDS so a failing load is not retried on every poll. Loads that revalidate (rates,
+# manifest) are also rerun RETRY_SECONDS after a success; one-shot jobs (refresh=False) never are.
+# Only the latest JOB_HISTORY_SIZE finished jobs are remembered.
+
+BACKGROUND_WORKERS = int(os.environ.get("MUSIQHUB_BACKGROUND_WORKERS", "2"))
+RETRY_SECONDS = float(os.environ.get("MUSIQHUB_BACKGROUND_RETRY_SECONDS", "30"))
+JOB_HISTORY_SIZE = int(os.environ.get("MUSIQHUB_BACKGROUND_JOB_HISTORY", "256"))
+
+_lock = threading.Lock()
+_executor = None
+_jobs = OrderedDict()
+
+
+def _run(fn):
+	# Executor threads live for the whole process; start a fresh per-run breakdown for each job
+	metrics.start_run()
+	return fn()
+
+
+def _prune():
+	# Call with _lock held: forget the oldest finished jobs beyond JOB_HISTORY_SIZE (running ones stay)
+	excess = len(_jobs) - JOB_HISTORY_SIZE
+	for key in [k for k, (future, _) in _jobs.items() if future.done()][:max(0, excess)]:
+		del _jobs[key]
+
+
+def submit_once(key, fn, retry_seconds=RETRY_SECONDS, refresh=True):
+	"""Run fn() in the background under key and return its Future.
+
+	A job still running, or one that finished less than retry_seconds ago, is returned as is.
+	With refresh=False a job that succeeded is never run again (while it is remembered).
+	"""
+	global _executor
+	with _lock:
+		job = _jobs.get(key)
+		if job is not None:
+			future, started = job
+			succeeded = future.done() and not future.cancelled() and future.exception() is None
+			if not future.done() or (succeeded and not refresh) or time.time() - started < retry_seconds:
+				_jobs.move_to_end(key)
+				return future
+		if _executor is None:
+			_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="musiqhub-bg")
+		future = _executor.submit(_run, fn)
+		_jobs[key] = (future, time.time())
+		_jobs.move_to_end(key)
+		_prune()
+		return future
+
+
+def job(key):
+	"""The latest Future submitted under key, or None."""
+	entry = _jobs.get(key)
+	return entry[0] if entry else None
+
+
+def failure(key):
+	"""The exception of the latest job under key if it finished with one, else None."""
+	future = job(key)
+	if future is None or not future.done():
+		return None
+	return future.exception()
@@ -12,6 +12,8 @@ from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib.pagesizes import A4, landscape as rl_landscape
+from franchise_store import FranchiseStore
+import synthetic_data
 
 st.set_page_config(page_title="Source Data", layout="wide")
 
@@ -198,94 +200,53 @@ if selected_tab == "MusiqHub Dashboard":
 		st.sidebar.header("Filters")
 		uploaded_file = st.sidebar.file_uploader("Upload CSV", type=["csv"], key="main_csv")
 
-		if "full_data" not in st.session_state:
-				years = [2022, 2023, 2024]
-				terms = ["Term 1", "Term 2", "Term 3", "Term 4"]
-				franchisees = ["Bob Smith", "Alice Johnson", "Tom Lee", "Sophie Wright", "David Brown", "Emma Green", "Chris Adams", "Laura Hill", "James Fox", "Nina Wood"]
-				schools = ["Mt Roskill Grammar", "Epsom Girls Grammar", "Avondale College", "Lynfield College", "Onehunga High", "Auckland Grammar", "St Cuthbert's", "Baradene College", "Western Springs College", "Selwyn College"]
-				instruments = ["Guitar", "Piano", "Drums", "Violin", "Flute"]
-
-				np.random.seed(42)
-				data = []
-				for f in franchisees:
-						for s in schools[:2]:
-								for y in years:
-										for t in terms:
-												for i in instruments:
-														student_count = np.random.randint(1, 6)
-														lesson_count = student_count * np.random.randint(4, 10)
-														new_enrolments = np.random.randint(0, 3)
-														cancellations = np.random.randint(0, 3)
-														avg_revenue = np.random.uniform(25, 50)
-														lifetime_revenue = avg_revenue * student_count * np.random.randint(3, 8)
-														gross_profit = lifetime_revenue * 0.65
-														data.append([f, s, y, t, i, student_count, lesson_count, new_enrolments, cancellations, avg_revenue, lifetime_revenue, gross_profit])
-
-				st.session_state["full_data"] = pd.DataFrame(data, columns=[
-						"Franchisee", "School", "Year", "Term", "Instrument",
-						"Student Count", "Lesson Count", "New Enrolments", "Cancellations",
-						"Avg Revenue", "Lifetime Revenue", "Gross Profit"
-				])
+		if "franchise_store" not in st.session_state:
+				# Demo data: the vectorized generator's default grid (10 franchisees x 2 schools x 3 years x 4 terms x 5 instruments)
+				st.session_state["franchise_store"] = FranchiseStore(synthetic_data.franchise_frame(seed=42))
+		store = st.session_state["franchise_store"]
 
+		# The uploader returns the same file on every rerun; the store ingests each file's content once
 		if uploaded_file is not None:
-				new_data = pd.read_csv(uploaded_file)
-				st.session_state["full_data"] = pd.concat([st.session_state["full_data"], new_data], ignore_index=True)
-
-		df = st.session_state["full_data"]
-
-		years = sorted(df["Year"].unique())
-		terms = sorted(df["Term"].unique())
-		franchisees = sorted(df["Franchisee"].unique())
-
-		selected_year = st.sidebar.selectbox("Filter by Year", ["All"] + list(years), index=0)
-		selected_term = st.sidebar.selectbox("Filter by Term", ["All"] + list(terms), index=0)
-		selected_franchisee = st.sidebar.selectbox("Filter by Franchisee", ["All"] + list(franchisees), index=0)
-
-		filtered_df = df.copy()
-		if selected_year != "All":
-				filtered_df = filtered_df[filtered_df["Year"] == selected_year]
-		if selected_term != "All":
-				filtered_df = filtered_df[filtered_df["Term"] == selected_term]
-		if selected_franchisee != "All":
-				filtered_df = filtered_df[filtered_df["Franchisee"] == selected_franchisee]
-
-		with st.expander("School by Number of Students by Term / Year"):
-				st.markdown(filtered_df.groupby(["Year", "Term", "School"]).agg({"Student Count": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("School by Instrument by Student Numbers"):
-				st.markdown(filtered_df.groupby(["School", "Instrument"]).agg({"Student Count": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Franchisee by School by Student Numbers by Term / Year"):
-				st.markdown(filtered_df.groupby(["Franchisee", "School", "Year", "Term"]).agg({"Student Count": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Franchisee by School by Lesson Numbers by Term / Year"):
-				st.markdown(filtered_df.groupby(["Franchisee", "School", "Year", "Term"]).agg({"Lesson Count": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Franchisee by School by Instrument (Number of Students)"):
-				st.markdown(filtered_df.groupby(["Franchisee", "School", "Instrument"]).agg({"Student Count": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("New Student Enrolment by Franchisee"):
-				st.markdown(filtered_df.groupby("Franchisee").agg({"New Enrolments": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Retention Rate by Franchisee"):
-				retention = filtered_df.groupby("Franchisee").agg({"Student Count": "sum", "New Enrolments": "sum"}).reset_index()
+				try:
+						added = store.ingest_csv(uploaded_file, upload_id=uploaded_file.file_id)
+				except (ValueError, TypeError) as e:
+						st.sidebar.error(f"Could not read {uploaded_file.name}: {e}")
+				else:
+						if added:
+								st.sidebar.success(f"Added {added:,} rows from {uploaded_file.name}")
+
+		# The cube is extended per upload and shared by every filter and expander
+		cube = store.cube
+
+		selected_year = st.sidebar.selectbox("Filter by Year", ["All"] + cube.values("Year"), index=0)
+		selected_term = st.sidebar.selectbox("Filter by Term", ["All"] + cube.values("Term"), index=0)
+		selected_franchisee = st.sidebar.selectbox("Filter by Franchisee", ["All"] + cube.values("Franchisee"), index=0)
+		filters = {dim: (None if value == "All" else value) for dim, value in [("Year", selected_year), ("Term", selected_term), ("Franchisee", selected_franchisee)]}
+
+		def lazy_expander(label, key, build):
+				# The table is built (and rendered) only while the expander is open
+				box = st.expander(label, key=key, on_change="rerun")
+				if box.open:
+						with box:
+								st.markdown(build().to_html(index=False), unsafe_allow_html=True)
+
+		def retention_by_franchisee():
+				retention = cube.rollup(["Franchisee"], filters, sums=["Student Count", "New Enrolments"]).copy()
 				retention["Retention Rate %"] = (1 - retention["New Enrolments"] / retention["Student Count"]).fillna(0) * 100
-				st.markdown(retention[["Franchisee", "Retention Rate %"]].to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Lesson Cancellations by Franchisee"):
-				st.markdown(filtered_df.groupby("Franchisee").agg({"Cancellations": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Average Revenue per Student by Franchisee"):
-				st.markdown(filtered_df.groupby("Franchisee").agg({"Avg Revenue": "mean"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Average Lifetime Revenue per Student by Franchisee"):
-				st.markdown(filtered_df.groupby("Franchisee").agg({"Lifetime Revenue": "mean"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Total Revenue by Franchisee"):
-				st.markdown(filtered_df.groupby("Franchisee").agg({"Lifetime Revenue": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
-
-		with st.expander("Gross Profit by Franchisee"):
-				st.markdown(filtered_df.groupby("Franchisee").agg({"Gross Profit": "sum"}).reset_index().to_html(index=False), unsafe_allow_html=True)
+				return retention[["Franchisee", "Retention Rate %"]]
+
+		lazy_expander("School by Number of Students by Term / Year", "students_by_term", lambda: cube.rollup(["Year", "Term", "School"], filters, sums=["Student Count"]))
+		lazy_expander("School by Instrument by Student Numbers", "students_by_instrument", lambda: cube.rollup(["School", "Instrument"], filters, sums=["Student Count"]))
+		lazy_expander("Franchisee by School by Student Numbers by Term / Year", "franchisee_students_by_term", lambda: cube.rollup(["Franchisee", "School", "Year", "Term"], filters, sums=["Student Count"]))
+		lazy_expander("Franchisee by School by Lesson Numbers by Term / Year", "franchisee_lessons_by_term", lambda: cube.rollup(["Franchisee", "School", "Year", "Term"], filters, sums=["Lesson Count"]))
+		lazy_expander("Franchisee by School by Instrument (Number of Students)", "franchisee_students_by_instrument", lambda: cube.rollup(["Franchisee", "School", "Instrument"], filters, sums=["Student Count"]))
+		lazy_expander("New Student Enrolment by Franchisee", "enrolments", lambda: cube.rollup(["Franchisee"], filters, sums=["New Enrolments"]))
+		lazy_expander("Retention Rate by Franchisee", "retention", retention_by_franchisee)
+		lazy_expander("Lesson Cancellations by Franchisee", "cancellations", lambda: cube.rollup(["Franchisee"], filters, sums=["Cancellations"]))
+		lazy_expander("Average Revenue per Student by Franchisee", "avg_revenue", lambda: cube.rollup(["Franchisee"], filters, means=["Avg Revenue"]))
+		lazy_expander("Average Lifetime Revenue per Student by Franchisee", "avg_lifetime_revenue", lambda: cube.rollup(["Franchisee"], filters, means=["Lifetime Revenue"]))
+		lazy_expander("Total Revenue by Franchisee", "total_revenue", lambda: cube.rollup(["Franchisee"], filters, sums=["Lifetime Revenue"]))
+		lazy_expander("Gross Profit by Franchisee", "gross_profit", lambda: cube.rollup(["Franchisee"], filters, sums=["Gross Profit"]))
 
 elif selected_tab == "Event Profit Summary":
 		st.title("Event Profit Summary Dashboard")
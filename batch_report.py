@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Headless month-end report runner.
+
+Builds the Event Profit Summary combined PDF for every tutor x month without the UI, using the
+same loader, room-rate lookup, tier schedule and report renderer as the app.
+
+Examples:
+	# Offline: <input-dir>/<tutor folder>/<YYYY-MM>.xlsx
+	python batch_report.py --input-dir ./source --output-dir ./reports --months 2025-02
+
+	# From Google Drive with a service-account key, 4 worker processes, 3 concurrent downloads
+	python batch_report.py --service-account key.json --output-dir ./reports --workers 4 --drive-concurrency 3
+
+Writes <output-dir>/<tutor>/<tutor>_<YYYY-MM>_Combined_Report.pdf per job and
+<output-dir>/summary.json with per-report totals. Every month is also added to the local history
+cube (history_store.py), so a run over past months backfills the Franchise History page.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import drive_client
+import drive_manifest
+import frame_store
+import history_store
+import profit_engine
+import rate_cache
+import room_rate
+import workbook_cache
+from event_loader import parse_event_workbook
+from reports import write_combined_pdf
+
+
+def load_gst_settings(path, no_gst, default):
+	"""Per-tutor GST flags keyed by normalized tutor name: JSON file {"tutor": true/false} plus --no-gst names."""
+	settings = {}
+	if path:
+		with open(path, "r", encoding="utf-8") as f:
+			for tutor, value in json.load(f).items():
+				settings[room_rate.normalize_tutor_name(tutor)] = bool(value)
+	for tutor in no_gst or []:
+		settings[room_rate.normalize_tutor_name(tutor)] = False
+	return lambda tutor: settings.get(room_rate.normalize_tutor_name(tutor), default)
+
+
+def local_jobs(input_dir):
+	jobs = []
+	for folder in sorted(p for p in Path(input_dir).iterdir() if p.is_dir()):
+		for path in sorted(folder.glob("*.xlsx")):
+			ym = drive_manifest.month_key(path.name)
+			if ym and not path.name.startswith("~$"):
+				jobs.append((folder.name, ym, str(path)))
+	return jobs
+
+
+def drive_jobs(manifest):
+	return [(tutor, ym, manifest.resolve(tutor, ym)) for tutor in manifest.tutors() for ym in manifest.months(tutor)]
+
+
+def fetch_drive_workbook(factory, meta, download=None):
+	"""Thread-pool task: the client comes from factory() here, on the download thread, as
+	httplib2-backed clients must not be shared between threads."""
+	return workbook_cache.fetch_workbook(factory(), meta["id"], meta, download=download)
+
+
+def run_job(tutor, year_month, data, apply_gst, rate_table, output_dir):
+	"""Worker: clean one workbook, compute the summary, write the combined PDF, add the month to the
+	history cube and return its totals. A failed history ingest is reported, not raised: the PDF stands."""
+	digest = hashlib.md5(data).hexdigest()
+	lessons = frame_store.cached_frame(digest, lambda: parse_event_workbook(data))
+	stages = profit_engine.profit_stages(lessons, tutor, apply_gst, rate_table)
+	students, tier_summary, profit, enriched, totals = profit_engine.present(*stages)
+	title = f"{tutor}_{year_month}_Combined_Report"
+	out_path = Path(output_dir) / tutor / f"{title}.pdf"
+	out_path.parent.mkdir(parents=True, exist_ok=True)
+	write_combined_pdf(out_path, profit_engine.report_tables(students, tier_summary, profit), title)
+
+	schools = totals["schools"]
+	result = {
+		"tutor": tutor,
+		"month": year_month,
+		"gst": apply_gst,
+		"lessons": int(len(enriched)),
+		"students": totals["students"]["Total Students"],
+		"lesson_income": schools["Lesson Income"] / 100,
+		"gst_component": schools["GST"] / 100,
+		"room_hire": schools["Room Hire"] / 100,
+		"net_income": schools["Net Income"] / 100,
+		"support_fee": totals["tiers"]["Support Fee"] / 100,
+		"report": str(out_path.relative_to(output_dir)),
+	}
+	try:
+		history_store.ingest_month(tutor, year_month, digest, lessons, apply_gst, rate_table, stages=stages)
+	except Exception as e:
+		result["history_error"] = str(e)
+	return result
+
+
+def _run_local_job(tutor, year_month, path, apply_gst, rate_table, output_dir):
+	with open(path, "rb") as f:
+		data = f.read()
+	return run_job(tutor, year_month, data, apply_gst, rate_table, output_dir)
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description="Generate month-end combined reports for every tutor and month.")
+	source = parser.add_mutually_exclusive_group(required=True)
+	source.add_argument("--input-dir", help="Offline mode: directory of <tutor>/<YYYY-MM>.xlsx workbooks")
+	source.add_argument("--service-account", help="Drive mode: path to the service-account JSON key")
+	parser.add_argument("--output-dir", required=True, help="Where PDFs and summary.json are written")
+	parser.add_argument("--tutors", nargs="*", help="Only these tutors (folder or display names)")
+	parser.add_argument("--months", nargs="*", help="Only these months (YYYY-MM)")
+	parser.add_argument("--rates-xlsx", help="Room-rate sheet exported as xlsx (default: Drive sheet in Drive mode, built-in table offline)")
+	parser.add_argument("--gst-config", help="JSON file mapping tutor -> true/false for applying GST")
+	parser.add_argument("--no-gst", nargs="*", default=[], help="Tutors not registered for GST")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+	parser.add_argument("--drive-concurrency", type=int, default=2, help="Maximum concurrent Drive downloads")
+	return parser.parse_args(argv)
+
+
+def main(argv=None):
+	args = parse_args(argv)
+	output_dir = Path(args.output_dir)
+	output_dir.mkdir(parents=True, exist_ok=True)
+	gst_for = load_gst_settings(args.gst_config, args.no_gst, default=True)
+
+	drive_pool = drive_client.DriveClientPool.from_service_account_file(args.service_account, concurrency=args.drive_concurrency) if args.service_account else None
+	factory = drive_pool.service if drive_pool else None
+	if args.rates_xlsx:
+		rate_table = room_rate.room_rates_from_xlsx(args.rates_xlsx)
+	elif factory:
+		rate_table = rate_cache.get_room_rates(
+			factory, room_rate.ROOM_RATE_FILE_ID, room_rate.ROOM_RATE_SHEET,
+			lambda file_id, sheet: room_rate.room_rates_from_xlsx(workbook_cache.export_file_bytes(factory(), file_id), sheet),
+		)
+	else:
+		rate_table = room_rate.BUILTIN_RATES
+
+	jobs = local_jobs(args.input_dir) if args.input_dir else drive_jobs(drive_manifest.get_manifest(factory))
+	if args.tutors:
+		wanted = {room_rate.normalize_tutor_name(t) for t in args.tutors}
+		jobs = [j for j in jobs if room_rate.normalize_tutor_name(j[0]) in wanted]
+	if args.months:
+		jobs = [j for j in jobs if j[1] in set(args.months)]
+
+	results = []
+	with ProcessPoolExecutor(max_workers=max(1, args.workers)) as workers:
+		futures = {}
+		if args.input_dir:
+			for tutor, ym, path in jobs:
+				futures[workers.submit(_run_local_job, tutor, ym, path, gst_for(tutor), rate_table, str(output_dir))] = (tutor, ym)
+		else:
+			# Downloads run on a small thread pool (the Drive concurrency limit); each finished download
+			# is handed to the process pool while the others are still in flight
+			with ThreadPoolExecutor(max_workers=max(1, args.drive_concurrency)) as fetchers:
+				fetches = {fetchers.submit(fetch_drive_workbook, factory, meta, drive_pool.download): (tutor, ym) for tutor, ym, meta in jobs}
+				for fetch in as_completed(fetches):
+					tutor, ym = fetches[fetch]
+					try:
+						data = fetch.result()
+					except Exception as e:
+						results.append({"tutor": tutor, "month": ym, "error": f"download failed: {e}"})
+						continue
+					futures[workers.submit(run_job, tutor, ym, data, gst_for(tutor), rate_table, str(output_dir))] = (tutor, ym)
+		for future in as_completed(futures):
+			tutor, ym = futures[future]
+			try:
+				results.append(future.result())
+			except Exception as e:
+				results.append({"tutor": tutor, "month": ym, "error": str(e)})
+
+	results.sort(key=lambda r: (r["tutor"].lower(), r["month"]))
+	with open(output_dir / "summary.json", "w", encoding="utf-8") as f:
+		json.dump({"generated_at": datetime.now().isoformat(timespec="seconds"), "reports": results}, f, indent=2)
+	failed = [r for r in results if "error" in r]
+	print(f"{len(results) - len(failed)} reports written to {output_dir}, {len(failed)} failed")
+	for r in failed:
+		print(f"  {r['tutor']} {r['month']}: {r['error']}", file=sys.stderr)
+	for r in results:
+		if "history_error" in r:
+			print(f"  {r['tutor']} {r['month']}: report written, not added to history: {r['history_error']}", file=sys.stderr)
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Benchmarks for the month-end hot paths on synthetic event sheets.
+
+Times and memory-profiles each stage (cleaning, streaming load, room-rate lookups, tier
+classification, the summary groupbys, the full profit summary, the combined PDF with and without
+the lesson rows, plus the franchise dashboard's cube, rollups and CSV ingestion) at several sizes
+and writes the results as JSON. Pass --compare with an earlier results file to print the ratios
+and fail on regressions. --startup also times the app's cold start and first page
+switch in fresh processes and fails if either exceeds --startup-budget.
+
+Examples:
+	python benchmark.py --output bench.json
+	python benchmark.py --sizes 1000 10000 --repeat 5 --output new.json --compare bench.json
+	python benchmark.py --sizes --startup
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import profit_engine
+import synthetic_data
+import synthetic_events
+import tiers
+from event_loader import clean_event_sheet, compact_lessons, load_event_sheet
+from franchise_cube import FranchiseCube
+from franchise_store import FranchiseStore
+from rate_resolver import RoomRateResolver
+from reports import make_combined_pdf_bytes
+from room_rate import BUILTIN_RATES
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Writing and re-reading xlsx is by far the slowest setup step; larger sizes skip the workbook stages
+MAX_XLSX_ROWS = 100_000
+# A lesson-level PDF runs to a page per ~40 lessons; larger sizes skip the lesson_pdf stage
+MAX_PDF_ROWS = 10_000
+STARTUP_BUDGET = 1.0  # seconds
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+
+class Context:
+	"""Inputs for one sheet size, built once and shared by every stage."""
+
+	def __init__(self, rows, seed, with_xlsx):
+		self.rows = rows
+		self.raw = synthetic_events.event_rows(rows, seed=seed)
+		self.xlsx = synthetic_events.workbook_bytes(self.raw) if with_xlsx else None
+		self.lessons = compact_lessons(clean_event_sheet(self.raw))
+		self.tutor = str(self.lessons["Teacher Name"].iloc[0]) if len(self.lessons) else ""
+		self.descriptions = self.lessons["Description"].astype(object).tolist()
+		# Cent-valued lesson charges, the input of the tier and profit stages
+		resolver = _fresh_resolver()
+		_, hire_by_norm = profit_engine.students_by_school(self.lessons, self.tutor, resolver)
+		room_hire = profit_engine.room_hire_per_lesson(self.lessons, self.tutor, resolver, hire_by_norm)
+		self.charged = profit_engine.lesson_charges(self.lessons, profit_engine.gst_component(self.lessons["Billed Amount"], True), room_hire)
+		students, tier_summary, profit, enriched, _ = profit_engine.compute_profit_summary(self.lessons, self.tutor, True, BUILTIN_RATES)
+		self.tables = profit_engine.report_tables(students, tier_summary, profit)
+		self.lesson_tables = self.tables + [("Lessons", enriched)]
+		# Franchise dashboard data of the same row count, with about one grid cell per row
+		self.franchise = synthetic_data.franchise_frame(rows, seed=seed, n_franchisees=max(10, rows // 120))
+		self._franchise_csv = None
+
+	def franchise_csv(self):
+		if self._franchise_csv is None:
+			self._franchise_csv = self.franchise.to_csv(index=False).encode()
+		return self._franchise_csv
+
+
+def _fresh_resolver():
+	# A new resolver per run so every lookup pays the cold (unmemoized) cost
+	return RoomRateResolver(BUILTIN_RATES)
+
+
+def stage_get_room_rate(ctx):
+	resolver = _fresh_resolver()
+	return lambda: [resolver.resolve(d, ctx.tutor) for d in ctx.descriptions]
+
+
+def stage_resolve_many(ctx):
+	resolver = _fresh_resolver()
+	return lambda: resolver.resolve_many(ctx.lessons["Description"], ctx.tutor)
+
+
+def stage_students_by_school(ctx):
+	resolver = _fresh_resolver()
+	return lambda: profit_engine.students_by_school(ctx.lessons, ctx.tutor, resolver)
+
+
+# The MusiqHub Dashboard's tables: (dimensions, summed measures, averaged measures)
+FRANCHISE_ROLLUPS = [
+	(["Year", "Term", "School"], ["Student Count"], []),
+	(["School", "Instrument"], ["Student Count"], []),
+	(["Franchisee", "School", "Year", "Term"], ["Student Count", "Lesson Count"], []),
+	(["Franchisee", "School", "Instrument"], ["Student Count"], []),
+	(["Franchisee"], ["Student Count", "New Enrolments", "Cancellations", "Lifetime Revenue", "Gross Profit"], ["Avg Revenue", "Lifetime Revenue"]),
+]
+
+
+def stage_franchise_rollups(ctx):
+	# A fresh cube per run so every rollup misses the cache; unfiltered, then filtered to one year
+	cube = FranchiseCube(ctx.franchise)
+	year = cube.values("Year")[0]
+	return lambda: [cube.rollup(by, filters, sums, means) for filters in ({}, {"Year": year}) for by, sums, means in FRANCHISE_ROLLUPS]
+
+
+def stage_franchise_ingest_csv(ctx):
+	data = ctx.franchise_csv()
+	return lambda: FranchiseStore().ingest_csv(io.BytesIO(data))
+
+
+# name -> (builder(ctx) returning the timed callable, needs the xlsx bytes)
+STAGES = {
+	"clean_event_sheet": (lambda ctx: lambda: clean_event_sheet(ctx.raw), False),
+	"load_event_sheet": (lambda ctx: lambda: load_event_sheet(ctx.xlsx), True),
+	"get_room_rate": (stage_get_room_rate, False),
+	"resolve_many": (stage_resolve_many, False),
+	"tiers.classify_cents": (lambda ctx: lambda: tiers.classify_cents(ctx.charged[profit_engine.NET_FEE], dates=ctx.charged["Event Date"]), False),
+	"students_by_school": (stage_students_by_school, False),
+	"support_fees_by_tier": (lambda ctx: lambda: profit_engine.support_fees_by_tier(ctx.charged), False),
+	"profit_by_school": (lambda ctx: lambda: profit_engine.profit_by_school(ctx.charged), False),
+	"compute_profit_summary": (lambda ctx: lambda: profit_engine.compute_profit_summary(ctx.lessons, ctx.tutor, True, BUILTIN_RATES), False),
+	"make_combined_pdf_bytes": (lambda ctx: lambda: make_combined_pdf_bytes(ctx.tables, "Benchmark"), False),
+	"lesson_pdf": (lambda ctx: lambda: make_combined_pdf_bytes(ctx.lesson_tables, "Benchmark"), False),
+	"franchise_cube": (lambda ctx: lambda: FranchiseCube(ctx.franchise), False),
+	"franchise_rollups": (stage_franchise_rollups, False),
+	"franchise_ingest_csv": (stage_franchise_ingest_csv, False),
+}
+
+
+def measure(build, ctx, repeat):
+	"""Best and median wall time over `repeat` runs, then peak traced allocation of one more run."""
+	times = []
+	for _ in range(repeat):
+		fn = build(ctx)
+		start = time.perf_counter()
+		fn()
+		times.append(time.perf_counter() - start)
+	fn = build(ctx)
+	tracemalloc.start()
+	try:
+		fn()
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	return {"best_s": min(times), "median_s": statistics.median(times), "peak_mb": peak / (1024 * 1024)}
+
+
+# Runs in a fresh interpreter with an empty cache directory and prints two timings in seconds:
+#   cold start: the first session on a just-started server, i.e. importing the app's modules
+#   (pandas included) plus the first script run up to first paint. Streamlit itself is imported
+#   by `streamlit run` before the server accepts connections, so it is imported before the clock starts;
+#   first interaction: the rerun after switching page, as a browser click would trigger it.
+# Script runs go through AppTest; its own per-run overhead is measured on an empty script and
+# subtracted. Without Drive secrets the background loads fail fast, the slowest path to first paint.
+STARTUP_SCRIPT = """
+import importlib, os, sys, tempfile, time
+import streamlit
+start = time.perf_counter()
+for name in {modules!r}:
+	importlib.import_module(name)
+imported = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+empty = os.path.join(tempfile.mkdtemp(), "empty_app.py")
+with open(empty, "w") as f:
+	f.write("import streamlit as st\\nst.radio('Select Page', ['a', 'b'])\\n")
+
+def timed(run):
+	t = time.perf_counter()
+	at = run()
+	return at, time.perf_counter() - t
+
+base, _ = timed(lambda: AppTest.from_file(empty).run())
+_, base_first = timed(lambda: AppTest.from_file(empty).run())
+at, first = timed(lambda: AppTest.from_file({app!r}, default_timeout=60).run())
+_, base_switch = timed(lambda: base.radio[0].set_value("b").run())
+_, switch = timed(lambda: at.sidebar.radio[0].set_value("Event Profit Summary").run())
+print(imported - start + max(0.0, first - base_first), max(0.0, switch - base_switch))
+"""
+# Modules streamlit_app.py imports at start-up (keep in step with its import block)
+APP_MODULES = ["pandas", "numpy", "room_rate", "background", "rate_cache", "workbook_cache", "frame_store", "reports", "drive_client", "drive_manifest", "rate_resolver", "profit_engine", "history_store", "table_view", "metrics", "event_loader"]
+STARTUP_STAGES = ["startup.cold_start", "startup.first_interaction"]
+
+
+def run_startup(repeat, budget):
+	"""Startup results (median over `repeat` fresh processes), and those whose median exceeds budget seconds."""
+	script = STARTUP_SCRIPT.format(modules=APP_MODULES, app=APP_FILE)
+	times = {name: [] for name in STARTUP_STAGES}
+	for _ in range(repeat):
+		with tempfile.TemporaryDirectory() as cache_dir:
+			env = {**os.environ, "MUSIQHUB_CACHE_DIR": cache_dir}
+			out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, env=env, cwd=os.path.dirname(APP_FILE))
+		for name, value in zip(STARTUP_STAGES, out.stdout.split()[-2:]):
+			times[name].append(float(value))
+	results = []
+	for name, values in times.items():
+		result = {"stage": name, "rows": 0, "repeat": repeat, "best_s": min(values), "median_s": statistics.median(values), "peak_mb": None}
+		results.append(result)
+		over = result["median_s"] > budget
+		print(f"{name:>24} {result['median_s'] * 1000:>10.1f} ms{'  OVER BUDGET' if over else ''}", file=sys.stderr)
+	return results, [r for r in results if r["median_s"] > budget]
+
+
+def _git_commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def run(sizes, stages, repeat, seed, max_xlsx_rows, max_pdf_rows=MAX_PDF_ROWS):
+	results = []
+	for rows in sizes:
+		with_xlsx = rows <= max_xlsx_rows and any(STAGES[s][1] for s in stages)
+		start = time.perf_counter()
+		ctx = Context(rows, seed, with_xlsx)
+		print(f"{rows:>9,} rows: inputs ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+		for name in stages:
+			build, needs_xlsx = STAGES[name]
+			if needs_xlsx and ctx.xlsx is None:
+				continue
+			if name == "lesson_pdf" and rows > max_pdf_rows:
+				continue
+			result = {"stage": name, "rows": rows, "repeat": repeat, **measure(build, ctx, repeat)}
+			results.append(result)
+			print(f"{name:>24} {result['best_s'] * 1000:>10.1f} ms {result['peak_mb']:>9.1f} MB", file=sys.stderr)
+	return results
+
+
+def compare(results, baseline, threshold, floor=0.001):
+	"""Print best-time ratios against a baseline results file. Returns the regressed entries."""
+	before = {(r["stage"], r["rows"]): r for r in baseline["results"]}
+	regressions = []
+	print(f"{'stage':>24} {'rows':>9} {'before ms':>10} {'after ms':>10} {'ratio':>6}")
+	for r in results:
+		old = before.get((r["stage"], r["rows"]))
+		if old is None:
+			continue
+		ratio = r["best_s"] / old["best_s"] if old["best_s"] else float("inf")
+		# Sub-millisecond timings are mostly noise
+		regressed = ratio > threshold and r["best_s"] >= floor
+		if regressed:
+			regressions.append(r)
+		print(f"{r['stage']:>24} {r['rows']:>9,} {old['best_s'] * 1000:>10.1f} {r['best_s'] * 1000:>10.1f} {ratio:>6.2f}{'  REGRESSION' if regressed else ''}")
+	return regressions
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark the event-sheet and profit-summary hot paths.")
+	parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="Lesson rows per synthetic sheet")
+	parser.add_argument("--stages", nargs="*", choices=list(STAGES), default=list(STAGES), help="Stages to run")
+	parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (best and median are reported)")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--max-xlsx-rows", type=int, default=MAX_XLSX_ROWS, help="Largest size that gets a workbook for load_event_sheet")
+	parser.add_argument("--max-pdf-rows", type=int, default=MAX_PDF_ROWS, help="Largest size that gets the lesson-level lesson_pdf stage")
+	parser.add_argument("--output", help="Write results JSON here")
+	parser.add_argument("--compare", help="Earlier results JSON to compare against")
+	parser.add_argument("--threshold", type=float, default=1.25, help="Best-time ratio counted as a regression")
+	parser.add_argument("--startup", action="store_true", help="Also time the app's cold start and first page switch")
+	parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET, help="Median seconds allowed for each startup stage")
+	return parser.parse_args(argv)
+
+
+def main(argv=None):
+	args = parse_args(argv)
+	results = run(args.sizes, args.stages, max(1, args.repeat), args.seed, args.max_xlsx_rows, args.max_pdf_rows)
+	over_budget = []
+	if args.startup:
+		startup, over_budget = run_startup(max(1, args.repeat), args.startup_budget)
+		results.extend(startup)
+	report = {
+		"meta": {
+			"created": datetime.now().isoformat(timespec="seconds"),
+			"commit": _git_commit(),
+			"python": platform.python_version(),
+			"pandas": pd.__version__,
+			"numpy": np.__version__,
+			"machine": platform.machine(),
+			"seed": args.seed,
+		},
+		"results": results,
+	}
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
+	if args.compare:
+		with open(args.compare, "r", encoding="utf-8") as f:
+			baseline = json.load(f)
+		if compare(results, baseline, args.threshold):
+			return 1
+	return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
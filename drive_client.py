@@ -0,0 +1,140 @@
+import functools
+import io
+import os
+import queue
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import metrics
+
+# Pool of Drive clients for concurrent sessions and downloads.
+# A googleapiclient service sits on one httplib2.Http, which must not be used by two threads at
+# once, so every thread gets its own authorized client. Clients are kept in an idle pool and
+# reused: service() leases one to the calling thread until that thread exits, checkout() leases
+# one for the duration of a with-block. Credentials (and their token refreshes) are shared.
+# The Google client libraries (discovery in particular) are imported when the first client or
+# credentials are made, not when this module is, so importing it costs the app nothing at start-up.
+
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+DRIVE_POOL_SIZE = int(os.environ.get("MUSIQHUB_DRIVE_POOL_SIZE", "8"))
+DRIVE_CONCURRENCY = int(os.environ.get("MUSIQHUB_DRIVE_CONCURRENCY", "4"))
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("MUSIQHUB_DOWNLOAD_CHUNK_MB", "4")) * 1024 * 1024
+# Files at least this large are fetched as parallel byte ranges of DOWNLOAD_CHUNK_SIZE
+RANGED_DOWNLOAD_MIN = int(os.environ.get("MUSIQHUB_RANGED_DOWNLOAD_MB", "8")) * 1024 * 1024
+HTTP_TIMEOUT = 60
+
+
+@functools.cache
+def _counting_http_class():
+	from google_auth_httplib2 import AuthorizedHttp
+
+	class _CountingHttp(AuthorizedHttp):
+		# Every Drive request made through the pool is counted here, split into media and metadata calls
+		def request(self, uri, method="GET", *args, **kwargs):
+			resp, content = super().request(uri, method, *args, **kwargs)
+			kind = "media" if ("alt=media" in uri or "/export" in uri) else "metadata"
+			metrics.incr("drive_requests_total", kind=kind, status=str(resp.status))
+			metrics.incr("drive_bytes_total", len(content or b""), kind=kind)
+			return resp, content
+
+	return _CountingHttp
+
+
+class _Lease:
+	# Lives in a thread-local slot; when the thread ends it is collected and the client goes back
+	def __init__(self, pool, service):
+		self.service = service
+		weakref.finalize(self, pool._release, service)
+
+
+class DriveClientPool:
+	def __init__(self, credentials, size=DRIVE_POOL_SIZE, concurrency=DRIVE_CONCURRENCY):
+		# credentials, or a callable that makes them when the first client is built
+		self._credentials = credentials
+		self._credentials_lock = threading.Lock()
+		self.size = size
+		self._idle = queue.LifoQueue()
+		self._local = threading.local()
+		self._ranges = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="drive-range")
+
+	@classmethod
+	def from_service_account_info(cls, info, **kwargs):
+		def credentials():
+			from google.oauth2 import service_account
+			return service_account.Credentials.from_service_account_info(info, scopes=DRIVE_SCOPES)
+		return cls(credentials, **kwargs)
+
+	@classmethod
+	def from_service_account_file(cls, path, **kwargs):
+		def credentials():
+			from google.oauth2 import service_account
+			return service_account.Credentials.from_service_account_file(path, scopes=DRIVE_SCOPES)
+		return cls(credentials, **kwargs)
+
+	@property
+	def credentials(self):
+		with self._credentials_lock:
+			if callable(self._credentials):
+				self._credentials = self._credentials()
+			return self._credentials
+
+	def _new_service(self):
+		import httplib2
+		from googleapiclient.discovery import build
+		http = _counting_http_class()(self.credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+		return build("drive", "v3", http=http, cache_discovery=False)
+
+	def _acquire(self):
+		try:
+			return self._idle.get_nowait()
+		except queue.Empty:
+			return self._new_service()
+
+	def _release(self, service):
+		# Keep at most `size` idle clients; extras made under a burst are dropped
+		if self._idle.qsize() < self.size:
+			self._idle.put(service)
+
+	@contextmanager
+	def checkout(self):
+		"""Lease a client for the with-block."""
+		service = self._acquire()
+		try:
+			yield service
+		finally:
+			self._release(service)
+
+	def service(self):
+		"""The calling thread's client; it returns to the pool when the thread exits."""
+		lease = getattr(self._local, "lease", None)
+		if lease is None:
+			lease = self._local.lease = _Lease(self, self._acquire())
+		return lease.service
+
+	def _download_range(self, file_id, start, end):
+		with self.checkout() as service:
+			request = service.files().get_media(fileId=file_id)
+			request.headers["Range"] = f"bytes={start}-{end}"
+			return request.execute()
+
+	def download(self, file_id, size=None, chunksize=DOWNLOAD_CHUNK_SIZE):
+		"""Return a Drive file's content.
+
+		When the size is known and at least RANGED_DOWNLOAD_MIN, the file is fetched as byte ranges
+		of chunksize on parallel clients; otherwise with MediaIoBaseDownload in chunksize pieces.
+		"""
+		size = int(size or 0)
+		if size >= RANGED_DOWNLOAD_MIN and size > chunksize:
+			ranges = [(start, min(start + chunksize, size) - 1) for start in range(0, size, chunksize)]
+			parts = self._ranges.map(lambda r: self._download_range(file_id, *r), ranges)
+			return b"".join(parts)
+		from googleapiclient.http import MediaIoBaseDownload
+		with self.checkout() as service:
+			fh = io.BytesIO()
+			downloader = MediaIoBaseDownload(fh, service.files().get_media(fileId=file_id), chunksize=chunksize)
+			done = False
+			while not done:
+				status, done = downloader.next_chunk()
+			return fh.getvalue()
@@ -0,0 +1,267 @@
+import json
+import os
+import re
+import threading
+import time
+
+import metrics
+from atomic_file import atomic_write
+from rate_cache import CACHE_DIR
+
+# Tutor folder / monthly workbook index for Google Drive.
+# One paged files.list crawl collects every folder and xlsx file the service account can
+# see; afterwards the index is kept current from the Drive changes feed (changes.list from
+# the saved start-page token), so resolving a tutor + month is a dict lookup.
+#
+# Shape of the derived index:
+#   {tutor_folder_name: {"folder_id": ..., "months": {"YYYY-MM": {"id", "name", "md5Checksum", "modifiedTime"}}}}
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MANIFEST_PATH = CACHE_DIR / "drive_manifest.json"
+MANIFEST_REFRESH_SECONDS = int(os.environ.get("MUSIQHUB_MANIFEST_REFRESH_SECONDS", "30"))
+MANIFEST_REBUILD_SECONDS = int(os.environ.get("MUSIQHUB_MANIFEST_REBUILD_SECONDS", "86400"))
+
+FILE_FIELDS = "id, name, mimeType, parents, md5Checksum, modifiedTime, size, trashed"
+MONTH_RE = re.compile(r"(\d{4})-(\d{2})")
+
+
+def list_all(service, q, fields=FILE_FIELDS, page_size=1000):
+	"""Run files.list for q and follow nextPageToken until every page is read."""
+	files = []
+	page_token = None
+	while True:
+		results = service.files().list(
+			q=q,
+			fields=f"nextPageToken, files({fields})",
+			pageSize=page_size,
+			pageToken=page_token,
+			supportsAllDrives=True,
+			includeItemsFromAllDrives=True,
+		).execute()
+		files.extend(results.get("files", []))
+		page_token = results.get("nextPageToken")
+		if not page_token:
+			return files
+
+
+def month_key(file_name):
+	"""Return the YYYY-MM a workbook name refers to, or None."""
+	m = MONTH_RE.search(file_name or "")
+	if not m or not 1 <= int(m.group(2)) <= 12:
+		return None
+	return f"{m.group(1)}-{m.group(2)}"
+
+
+class DriveManifest:
+	def __init__(self, folders=None, files=None, start_page_token=None, built_at=0.0, refreshed_at=0.0):
+		# Flat maps are what the changes feed updates; the tutor index is derived from them
+		self.folders = folders or {}  # folder id -> name
+		self.files = files or {}  # file id -> metadata
+		self.start_page_token = start_page_token
+		self.built_at = built_at
+		self.refreshed_at = refreshed_at
+		self._index = None
+		# Bumped after every change to the maps; an index built across a bump is not kept
+		self._generation = 0
+
+	# --- building / refreshing ---
+
+	def rebuild(self, service):
+		# Take the token before crawling so changes made during the crawl are replayed, not lost
+		token = service.changes().getStartPageToken(supportsAllDrives=True).execute()["startPageToken"]
+		items = list_all(service, f"(mimeType = '{FOLDER_MIME}' or mimeType = '{XLSX_MIME}') and trashed = false")
+		self.folders = {}
+		self.files = {}
+		for item in items:
+			self._apply(item)
+		self.start_page_token = token
+		self.built_at = self.refreshed_at = time.time()
+		self._generation += 1
+		self._index = None
+
+	def refresh(self, service):
+		"""Apply pending changes from the Drive changes feed. Returns the number of changes applied."""
+		page_token = self.start_page_token
+		applied = 0
+		while page_token:
+			results = service.changes().list(
+				pageToken=page_token,
+				fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))",
+				pageSize=1000,
+				supportsAllDrives=True,
+				includeItemsFromAllDrives=True,
+			).execute()
+			for change in results.get("changes", []):
+				file = change.get("file")
+				if change.get("removed") or not file:
+					self._remove(change.get("fileId"))
+				else:
+					self._apply(file)
+				applied += 1
+			if "newStartPageToken" in results:
+				self.start_page_token = results["newStartPageToken"]
+			page_token = results.get("nextPageToken")
+		self.refreshed_at = time.time()
+		if applied:
+			self._generation += 1
+			self._index = None
+		return applied
+
+	def _remove(self, file_id):
+		self.folders.pop(file_id, None)
+		self.files.pop(file_id, None)
+
+	def _apply(self, item):
+		self._remove(item["id"])
+		if item.get("trashed"):
+			return
+		mime = item.get("mimeType")
+		if mime == FOLDER_MIME:
+			self.folders[item["id"]] = item.get("name", "")
+		elif mime == XLSX_MIME and month_key(item.get("name")):
+			self.files[item["id"]] = {
+				"id": item["id"],
+				"name": item.get("name", ""),
+				"parents": item.get("parents", []),
+				"md5Checksum": item.get("md5Checksum"),
+				"modifiedTime": item.get("modifiedTime"),
+				"size": item.get("size"),
+			}
+
+	# --- lookups ---
+
+	@property
+	def index(self):
+		# Lookups run on session threads while a background refresh may be updating the maps,
+		# so the index is built from copies and only cached if no change landed meanwhile
+		index = self._index
+		if index is None:
+			generation = self._generation
+			folders = dict(self.folders)
+			index = {}
+			for meta in list(self.files.values()):
+				ym = month_key(meta["name"])
+				for parent in meta["parents"]:
+					folder_name = folders.get(parent)
+					if folder_name is None:
+						continue
+					tutor = index.setdefault(folder_name, {"folder_id": parent, "months": {}})
+					current = tutor["months"].get(ym)
+					# Prefer the exact <YYYY-MM>.xlsx name, then the most recently modified file
+					rank = (meta["name"] == f"{ym}.xlsx", meta["modifiedTime"] or "")
+					if current is None or rank > (current["name"] == f"{ym}.xlsx", current["modifiedTime"] or ""):
+						tutor["months"][ym] = {k: meta[k] for k in ("id", "name", "md5Checksum", "modifiedTime")}
+			if generation == self._generation:
+				self._index = index
+		return index
+
+	def tutors(self):
+		return sorted(self.index, key=str.lower)
+
+	def months(self, tutor):
+		"""Return the available YYYY-MM keys for a tutor folder, newest first."""
+		return sorted(self.index.get(tutor, {}).get("months", {}), reverse=True)
+
+	def resolve(self, tutor, year_month):
+		"""Return the file metadata for a tutor folder and YYYY-MM, or None."""
+		return self.index.get(tutor, {}).get("months", {}).get(year_month)
+
+	# --- persistence ---
+
+	def to_dict(self):
+		return {
+			"folders": self.folders,
+			"files": self.files,
+			"start_page_token": self.start_page_token,
+			"built_at": self.built_at,
+			"refreshed_at": self.refreshed_at,
+		}
+
+	@classmethod
+	def from_dict(cls, data):
+		return cls(data["folders"], data["files"], data.get("start_page_token"), data.get("built_at", 0.0), data.get("refreshed_at", 0.0))
+
+
+_lock = threading.Lock()
+_manifest = None
+
+
+def _read_disk():
+	try:
+		with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+			return DriveManifest.from_dict(json.load(f))
+	except (OSError, ValueError, KeyError, TypeError):
+		return None
+
+
+def _write_disk(manifest):
+	try:
+		MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+		with atomic_write(MANIFEST_PATH, "w", encoding="utf-8") as f:
+			json.dump(manifest.to_dict(), f)
+	except OSError:
+		pass
+
+
+def get_manifest(service_factory, refresh_seconds=MANIFEST_REFRESH_SECONDS, rebuild_seconds=MANIFEST_REBUILD_SECONDS):
+	"""Return the process-wide DriveManifest, crawling once and then refreshing from the changes feed.
+
+	If Drive is unreachable a previously built manifest (in memory or on disk) is returned as is.
+	"""
+	global _manifest
+	with _lock:
+		if _manifest is None:
+			_manifest = _read_disk()
+		now = time.time()
+		if _manifest is not None and now - _manifest.refreshed_at < refresh_seconds:
+			return _manifest
+		try:
+			service = service_factory()
+			if _manifest is None or not _manifest.start_page_token or now - _manifest.built_at >= rebuild_seconds:
+				manifest = _manifest or DriveManifest()
+				with metrics.span("drive.manifest.rebuild"):
+					manifest.rebuild(service)
+				_manifest = manifest
+				_write_disk(_manifest)
+			else:
+				try:
+					with metrics.span("drive.manifest.refresh"):
+						applied = _manifest.refresh(service)
+					if applied:
+						_write_disk(_manifest)
+				except Exception:
+					# Expired or invalid page token: start over with a full crawl
+					with metrics.span("drive.manifest.rebuild"):
+						_manifest.rebuild(service)
+					_write_disk(_manifest)
+		except Exception:
+			if _manifest is None:
+				raise
+			# Keep serving the last index; try again after the next refresh interval
+			_manifest.refreshed_at = now
+		return _manifest
+
+
+def peek_manifest():
+	"""Return the manifest in memory or on disk without calling Drive or waiting on a crawl; None if never built."""
+	global _manifest
+	manifest = _manifest
+	if manifest is None:
+		manifest = _read_disk()
+		if manifest is not None and _lock.acquire(blocking=False):
+			try:
+				if _manifest is None:
+					_manifest = manifest
+				manifest = _manifest
+			finally:
+				_lock.release()
+	return manifest
+
+
+def invalidate_manifest():
+	"""Force a full crawl on the next get_manifest call."""
+	with _lock:
+		if _manifest is not None:
+			_manifest.built_at = 0.0
+			_manifest.refreshed_at = 0.0
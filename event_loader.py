@@ -0,0 +1,151 @@
+import io
+
+import pandas as pd
+
+import metrics
+import money
+
+# Bump when the cleaned frame produced by load_event_sheet/clean_event_sheet changes shape or
+# semantics; cached frames (frame_store) are keyed on it.
+LOADER_VERSION = 3
+
+# Event-sheet schema shared by the streaming loader and clean_event_sheet
+EXPECTED_COLUMNS = ["Event Date","Duration","Description","Teacher Name","Payroll Amount","Student Name","Family","Status","Pre-Tax Billed Amount","Billed Amount"]
+FFILL_COLUMNS = ["Event Date", "Duration", "Description"]
+MONEY_COLUMNS = ["Payroll Amount", "Pre-Tax Billed Amount", "Billed Amount"]
+# Student names repeat every week of the month, so they are categorical too
+CATEGORY_COLUMNS = ["Description", "Teacher Name", "Student Name", "Family", "Status"]
+
+
+# Function to clean the event sheet data
+# This function assumes the input DataFrame has the same structure as the one in the original code
+# Usage example:
+# df_raw = pd.read_excel("source/2025-02.xlsx", sheet_name=2, header=None)
+# df_clean = clean_event_sheet(df_raw)
+# st.dataframe(df_clean)
+def clean_event_sheet(df):
+		# Remove the first row (title/header row)
+		df = df.iloc[1:].reset_index(drop=True)
+		# Forward fill Event Date, Duration, Description (room name)
+		# Use infer_objects on the result of ffill to avoid future downcasting warnings
+		temp = df[[0, 1, 2]].ffill()
+		temp = temp.infer_objects(copy=False)
+		df[[0, 1, 2]] = temp
+		# Rename columns for clarity
+		expected_columns = EXPECTED_COLUMNS
+		if len(df.columns) >= len(expected_columns):
+				df = df.iloc[:, :len(expected_columns)]  # Trim extra columns if present
+				df.columns = expected_columns
+				# Remove the first row if it matches the column titles (in case header row is duplicated)
+				if (df.iloc[0] == expected_columns).all():
+					df = df.iloc[1:].reset_index(drop=True)
+		else:
+				raise ValueError(f"Column count mismatch: Expected at least {len(expected_columns)}, but got {len(df.columns)}")
+		# Drop rows where Student Name is missing or blank
+		df = df[df["Student Name"].notna() & (df["Student Name"].astype(str).str.strip() != "")]
+		df = df.reset_index(drop=True)
+		# Make the blank Pre-Tax Billed Amount 0.0
+		df["Pre-Tax Billed Amount"] = df["Pre-Tax Billed Amount"].fillna(0.0)
+		# Make the blank Billed Amount 0.0
+		df["Billed Amount"] = df["Billed Amount"].fillna(0.0)
+		return df
+
+
+def compact_lessons(df):
+	"""Give a cleaned lesson frame its compact dtypes.
+
+	Dates become datetime64, Duration the smallest integer type that fits, money int64 cents with
+	blanks as 0, and the repeating text columns categoricals.
+	"""
+	df = df.copy(deep=False)
+	# Dates: keep the raw values if any cell is not a recognisable date rather than losing it to NaT
+	dates = pd.to_datetime(df["Event Date"], errors="coerce", format="mixed", dayfirst=True)
+	if not (dates.isna() & df["Event Date"].notna()).any():
+		df["Event Date"] = dates
+	else:
+		df["Event Date"] = df["Event Date"].astype("category")
+	duration = pd.to_numeric(df["Duration"], errors="coerce")
+	if (duration.isna() & df["Duration"].notna()).any():
+		df["Duration"] = df["Duration"].astype(str).astype("category")
+	else:
+		df["Duration"] = pd.to_numeric(duration, downcast="integer") if duration.notna().all() else duration
+	# Money is converted to cents once, here; everything downstream is integer arithmetic
+	for col in MONEY_COLUMNS:
+		df[col] = money.to_cents(df[col])
+	df["Student Name"] = df["Student Name"].astype(str)
+	for col in CATEGORY_COLUMNS:
+		df[col] = df[col].astype("category")
+	return df
+
+
+def _typed_frame(columns):
+	return compact_lessons(pd.DataFrame(dict(zip(EXPECTED_COLUMNS, columns))))
+
+
+def load_event_sheet(source, sheet_index=0):
+	"""Stream an event-sheet workbook straight into the cleaned, typed lesson frame.
+
+	Equivalent to clean_event_sheet(pd.read_excel(source, sheet_name=0, header=None)) but reads
+	only the ten schema columns with openpyxl's read-only iter_rows, forward-fills Event Date,
+	Duration and Description while streaming and drops blank-student rows on the fly.
+	source may be a path, a file-like object or the workbook bytes.
+	"""
+	from openpyxl import load_workbook
+
+	if isinstance(source, (bytes, bytearray, memoryview)):
+		source = io.BytesIO(source)
+	width = len(EXPECTED_COLUMNS)
+	wb = load_workbook(source, read_only=True, data_only=True)
+	try:
+		ws = wb.worksheets[sheet_index]
+		# Accumulate column-wise so the frame is built without an intermediate row-major object array
+		columns = [[] for _ in EXPECTED_COLUMNS]
+		kept = 0
+		seen_width = 0
+		last = [None] * len(FFILL_COLUMNS)
+		first = True
+		# Row 1 is the title row; stream from row 2 and stop at the tenth column
+		for row in ws.iter_rows(min_row=2, max_col=width, values_only=True):
+			row = list(row) + [None] * (width - len(row))
+			for i in range(width - 1, -1, -1):
+				if row[i] is not None:
+					seen_width = max(seen_width, i + 1)
+					break
+			if first:
+				first = False
+				# Skip a duplicated header row
+				if [str(v).strip() if v is not None else "" for v in row] == EXPECTED_COLUMNS:
+					continue
+			for i in range(len(FFILL_COLUMNS)):
+				if row[i] is None:
+					row[i] = last[i]
+				else:
+					last[i] = row[i]
+			student = row[5]
+			if student is None or str(student).strip() == "":
+				continue
+			for col, value in zip(columns, row):
+				col.append(value)
+			kept += 1
+		sheet_width = ws.max_column or seen_width
+	finally:
+		wb.close()
+	if kept and sheet_width < width:
+		raise ValueError(f"Column count mismatch: Expected at least {width}, but got {sheet_width}")
+	return _typed_frame(columns)
+
+
+def parse_event_workbook(data):
+	"""Return the cleaned lesson frame for workbook bytes, streaming when the layout allows it."""
+	try:
+		with metrics.span("workbook.stream_load"):
+			return load_event_sheet(data)
+	except Exception:
+		# Unusual layout: fall back to the full-sheet read and clean_event_sheet
+		with metrics.span("workbook.read_excel"):
+			raw = pd.read_excel(io.BytesIO(data), sheet_name=0, header=None)
+		with metrics.span("workbook.clean_event_sheet"):
+			lessons = clean_event_sheet(raw)
+		# Only the compact frame is kept; the object-dtype sheet is released here
+		del raw
+		return compact_lessons(lessons)
@@ -0,0 +1,41 @@
+import hashlib
+import threading
+import weakref
+
+import pandas as pd
+
+# Content fingerprints of the frames the app memoizes on (profit_engine's stages, table_view's row
+# positions). Frames are shared between reruns and never edited in place, so fingerprint() hashes
+# each frame object once and keeps the result by id until the frame is garbage collected.
+
+_lock = threading.Lock()
+_fingerprints = {}
+
+
+def content_fingerprint(df):
+	"""Content hash of a frame: column names, dtypes and per-row hashes of each column."""
+	h = hashlib.sha1()
+	for name in df.columns:
+		col = df[name]
+		h.update(f"{name}\0{col.dtype}\0".encode())
+		try:
+			hashed = pd.util.hash_pandas_object(col, index=False)
+		except TypeError:
+			# Unhashable cells (e.g. lists of student names)
+			hashed = pd.util.hash_pandas_object(col.astype(str), index=False)
+		h.update(hashed.to_numpy().tobytes())
+	return h.hexdigest()
+
+
+def fingerprint(df):
+	"""content_fingerprint(df), computed once per frame object."""
+	frame_id = id(df)
+	with _lock:
+		result = _fingerprints.get(frame_id)
+	if result is None:
+		result = content_fingerprint(df)
+		with _lock:
+			_fingerprints[frame_id] = result
+		# The id may be reused once the frame is garbage collected
+		weakref.finalize(df, _fingerprints.pop, frame_id, None)
+	return result
@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+from atomic_file import atomic_write
+from event_loader import LOADER_VERSION
+from rate_cache import CACHE_DIR
+
+# Cleaned lesson frames stored as Arrow IPC sidecars, keyed by workbook checksum + loader version.
+# Files are written uncompressed so they can be opened memory-mapped: every session (and every
+# process after a restart) reads the same OS pages instead of re-parsing the xlsx, and sessions
+# in this process share one DataFrame object through a small LRU instead of holding copies.
+# The LRU is bounded by count and by bytes; an evicted frame is reopened from its sidecar on demand,
+# so sessions keep only the checksum and the resident set stays within FRAME_MEMORY_BUDGET.
+
+FRAME_DIR = CACHE_DIR / "frames"
+FRAME_MEMO_SIZE = int(os.environ.get("MUSIQHUB_FRAME_MEMO_SIZE", "16"))
+FRAME_MEMORY_BUDGET = int(os.environ.get("MUSIQHUB_FRAME_MEMORY_MB", "256")) * 1024 * 1024
+
+_lock = threading.Lock()
+_frames = OrderedDict()
+_frame_bytes = {}
+
+
+def _frame_path(digest):
+	return FRAME_DIR / f"{digest}-v{LOADER_VERSION}.arrow"
+
+
+def _remember(digest, df):
+	_frames[digest] = df
+	_frames.move_to_end(digest)
+	_frame_bytes[digest] = int(df.memory_usage(deep=True).sum())
+	# Always keep the newest frame, even if it alone exceeds the budget
+	while len(_frames) > 1 and (len(_frames) > FRAME_MEMO_SIZE or sum(_frame_bytes.values()) > FRAME_MEMORY_BUDGET):
+		evicted, _ = _frames.popitem(last=False)
+		del _frame_bytes[evicted]
+
+
+def resident_bytes():
+	"""Approximate bytes held by the in-memory frame LRU."""
+	with _lock:
+		return sum(_frame_bytes.values())
+
+
+def load_frame(digest):
+	"""Return the cleaned frame stored for a workbook checksum, or None if it was never stored."""
+	with _lock:
+		if digest in _frames:
+			_frames.move_to_end(digest)
+			metrics.cache_result("frames.memory", True)
+			return _frames[digest]
+	metrics.cache_result("frames.memory", False)
+	path = _frame_path(digest)
+	if not path.exists():
+		metrics.cache_result("frames.disk", False)
+		return None
+	import pyarrow as pa
+
+	try:
+		with pa.memory_map(str(path), "r") as source:
+			table = pa.ipc.open_file(source).read_all()
+		# split_blocks keeps numeric columns as zero-copy views over the mapped file where possible
+		df = table.to_pandas(split_blocks=True)
+	except (OSError, pa.ArrowInvalid):
+		metrics.cache_result("frames.disk", False)
+		return None
+	metrics.cache_result("frames.disk", True)
+	with _lock:
+		_remember(digest, df)
+	return df
+
+
+def store_frame(digest, df):
+	"""Write a cleaned frame as an Arrow IPC file for later memory-mapped loads."""
+	import pyarrow as pa
+
+	with _lock:
+		_remember(digest, df)
+	path = _frame_path(digest)
+	try:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		table = pa.Table.from_pandas(df, preserve_index=False)
+		# Two sessions storing the same digest each write their own temp file
+		with atomic_write(path) as sink:
+			with pa.ipc.new_file(sink, table.schema) as writer:
+				writer.write_table(table)
+	except (OSError, pa.ArrowException):
+		# The in-memory copy still serves this process
+		pass
+
+
+def cached_frame(digest, build):
+	"""Return the frame for digest, calling build() and storing its result on a miss."""
+	df = load_frame(digest)
+	if df is None:
+		df = build()
+		store_frame(digest, df)
+	return df
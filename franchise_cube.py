@@ -0,0 +1,150 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Aggregation layer for the franchise dashboard (backup-app.py).
+# The franchise frame is reduced once to a cube: every dimension is factorized to integer codes,
+# the codes are combined into one mixed-radix key per row, and each measure is summed per occupied
+# cell with a single np.bincount over that key. Index masks are precomputed over the cube's cells
+# (the cells holding each filter value), and rollups are cached by (dimensions, filter selection),
+# so changing a filter or opening an expander slices and regroups a few thousand cells instead of
+# re-scanning and copying the rows. Cubes are additive: extended() folds in new rows by reducing
+# only those rows and merging cells.
+
+DIMENSIONS = ["Franchisee", "School", "Year", "Term", "Instrument"]
+FILTER_DIMENSIONS = ["Year", "Term", "Franchisee"]
+MEASURES = ["Student Count", "Lesson Count", "New Enrolments", "Cancellations", "Avg Revenue", "Lifetime Revenue", "Gross Profit"]
+ROLLUP_CACHE_SIZE = 64
+
+
+def _group_key(codes, sizes, n):
+	# Mixed-radix combination of per-dimension codes into one int64 key per row
+	key = np.zeros(n, dtype=np.int64)
+	for c, size in zip(codes, sizes):
+		key = key * size + c
+	return key
+
+
+def _aggregate(codes, sizes, n, weights):
+	"""(occupied keys in order, {name: per-key sum of weights[name]}) for rows with the given codes."""
+	key = _group_key(codes, sizes, n)
+	space = int(np.prod(sizes, dtype=np.int64))
+	if space <= max(2 * n, 1 << 16):
+		# Small key space: dense bincounts straight over the key, no sort
+		occupied = np.flatnonzero(np.bincount(key, minlength=space))
+		return occupied, {name: np.bincount(key, weights=values, minlength=space)[occupied] for name, values in weights.items()}
+	keys, inverse = np.unique(key, return_inverse=True)
+	return keys, {name: np.bincount(inverse, weights=values, minlength=len(keys)) for name, values in weights.items()}
+
+
+def _reduce(df, weights):
+	"""One pass over df: (levels, codes per occupied cell, {column: per-cell sum of weights[column]})."""
+	levels = {}
+	codes = []
+	for dim in DIMENSIONS:
+		c, uniques = pd.factorize(df[dim], sort=True, use_na_sentinel=False)
+		levels[dim] = pd.Index(uniques)
+		codes.append(c.astype(np.int64))
+	sizes = [max(len(levels[dim]), 1) for dim in DIMENSIONS]
+	cells, sums = _aggregate(codes, sizes, len(df), weights)
+	return levels, dict(zip(DIMENSIONS, np.unravel_index(cells, sizes))), sums
+
+
+def _row_weights(df):
+	# Per-row sums and non-missing counts of each measure (counts make means match groupby().mean())
+	weights = {}
+	for measure in MEASURES:
+		values = pd.to_numeric(df[measure], errors="coerce")
+		weights[measure] = values.fillna(0).to_numpy(dtype=float)
+		weights[f"{measure}\0count"] = values.notna().to_numpy(dtype=float)
+	return weights
+
+
+class FranchiseCube:
+	"""Pre-aggregated franchise frame. Build once per dataset; rollup() for every table on the page."""
+
+	def __init__(self, df):
+		self.rows = len(df)
+		self.integer = {m: pd.api.types.is_integer_dtype(pd.to_numeric(df[m], errors="coerce")) for m in MEASURES}
+		self._index(*_reduce(df, _row_weights(df)))
+
+	def _index(self, levels, codes, sums):
+		self.levels = levels
+		self.codes = codes
+		self.sums = {m: sums[m] for m in MEASURES}
+		self.counts = {m: sums[f"{m}\0count"] for m in MEASURES}
+		# Index masks: per filter dimension, the cells sorted by value and where each value's run starts
+		self.masks = {}
+		for dim in FILTER_DIMENSIONS:
+			order = np.argsort(self.codes[dim], kind="stable")
+			bounds = np.searchsorted(self.codes[dim][order], np.arange(len(self.levels[dim]) + 1))
+			self.masks[dim] = (order, bounds)
+		self._rollups = OrderedDict()
+
+	def cells(self):
+		"""The cube as a frame: one row per occupied cell with its dimension values, sums and counts."""
+		frame = pd.DataFrame({dim: self.levels[dim].take(self.codes[dim]).to_numpy() for dim in DIMENSIONS})
+		for m in MEASURES:
+			frame[m] = self.sums[m]
+			frame[f"{m}\0count"] = self.counts[m]
+		return frame
+
+	def extended(self, df):
+		"""A new cube with df's rows added; only df is scanned, the existing cube is merged cell by cell."""
+		added = FranchiseCube(df)
+		merged = pd.concat([self.cells(), added.cells()], ignore_index=True)
+		cube = object.__new__(FranchiseCube)
+		cube.rows = self.rows + added.rows
+		cube.integer = {m: self.integer[m] and added.integer[m] for m in MEASURES}
+		cube._index(*_reduce(merged, {c: merged[c].to_numpy(dtype=float) for c in merged.columns if c not in DIMENSIONS}))
+		return cube
+
+	def values(self, dim):
+		"""Sorted distinct values of a dimension, for the filter widgets."""
+		return list(self.levels[dim])
+
+	def mask(self, filters):
+		"""Indexes of the cells matching {dimension: value}; None values mean "All"."""
+		selected = None
+		for dim, value in filters.items():
+			if value is None:
+				continue
+			code = self.levels[dim].get_indexer([value])[0]
+			if code < 0:
+				return np.array([], dtype=np.int64)
+			if selected is None:
+				order, bounds = self.masks[dim]
+				selected = order[bounds[code]:bounds[code + 1]]
+			else:
+				selected = selected[self.codes[dim][selected] == code]
+		return np.arange(len(self.codes[DIMENSIONS[0]])) if selected is None else np.sort(selected)
+
+	def rollup(self, by, filters=None, sums=(), means=()):
+		"""DataFrame of by-dimension groups with the summed and averaged measures, for the filtered rows.
+
+		Results are cached per (by, filters, sums, means); treat them as read-only.
+		"""
+		filters = {dim: value for dim, value in (filters or {}).items() if value is not None}
+		key = (tuple(by), tuple(sorted(filters.items(), key=lambda item: item[0])), tuple(sums), tuple(means))
+		if key in self._rollups:
+			self._rollups.move_to_end(key)
+			return self._rollups[key]
+		selected = self.mask(filters)
+		codes = [self.codes[dim][selected] for dim in by]
+		sizes = [max(len(self.levels[dim]), 1) for dim in by]
+		weights = {m: self.sums[m][selected] for m in set(sums) | set(means)}
+		weights.update({f"{m}\0count": self.counts[m][selected] for m in means})
+		groups, totals = _aggregate(codes, sizes, len(selected), weights)
+		# Groups come out in key order, i.e. sorted by each dimension's sorted levels
+		result = pd.DataFrame({dim: self.levels[dim].take(c).to_numpy() for dim, c in zip(by, np.unravel_index(groups, sizes))})
+		for measure in sums:
+			total = totals[measure]
+			result[measure] = np.round(total).astype(np.int64) if self.integer[measure] else total
+		for measure in means:
+			with np.errstate(invalid="ignore", divide="ignore"):
+				result[measure] = totals[measure] / totals[f"{measure}\0count"]
+		self._rollups[key] = result
+		while len(self._rollups) > ROLLUP_CACHE_SIZE:
+			self._rollups.popitem(last=False)
+		return result
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from franchise_cube import DIMENSIONS, FranchiseCube, MEASURES
+
+# Append-only store for the franchise dashboard's data (backup-app.py).
+# Uploads are fingerprinted by content, so the uploader handing back the same file on every rerun,
+# or the same CSV uploaded twice, is ingested once. CSVs are parsed in typed chunks of
+# CSV_CHUNK_ROWS rows; each chunk is folded into the store's FranchiseCube and then dropped (only a
+# row count is kept), so an upload costs time proportional to its own rows, the existing data is
+# neither copied nor re-scanned, and memory is bounded by the cube rather than the rows ingested.
+
+CSV_CHUNK_ROWS = int(os.environ.get("MUSIQHUB_CSV_CHUNK_ROWS", "100000"))
+COLUMNS = DIMENSIONS + MEASURES
+COLUMN_DTYPES = {
+	"Franchisee": "category",
+	"School": "category",
+	"Year": "Int64",
+	"Term": "category",
+	"Instrument": "category",
+	"Student Count": "Int64",
+	"Lesson Count": "Int64",
+	"New Enrolments": "Int64",
+	"Cancellations": "Int64",
+	"Avg Revenue": "float64",
+	"Lifetime Revenue": "float64",
+	"Gross Profit": "float64",
+}
+
+
+def file_fingerprint(source, block_size=1 << 20):
+	"""sha256 of a file-like object's content, read in blocks; the position is reset afterwards."""
+	h = hashlib.sha256()
+	source.seek(0)
+	for block in iter(lambda: source.read(block_size), b""):
+		h.update(block)
+	source.seek(0)
+	return h.hexdigest()
+
+
+def _typed(chunk):
+	# Only the dashboard's columns are kept; ones missing from the CSV are all-missing
+	return chunk.reindex(columns=COLUMNS)
+
+
+class FranchiseStore:
+	"""Franchise rows folded into a cube, with their count. Keep one per session."""
+
+	def __init__(self, base=None):
+		self.rows = 0
+		self.cube = None
+		self.fingerprints = set()
+		self.uploads = {}  # uploader file id -> content fingerprint
+		if base is not None:
+			self._append(base[COLUMNS])
+
+	def _append(self, chunk):
+		self.cube = FranchiseCube(chunk) if self.cube is None else self.cube.extended(chunk)
+		self.rows += len(chunk)
+
+	def ingest_csv(self, source, upload_id=None):
+		"""Append a CSV (path or file-like) unless its content was ingested before. Returns the rows added."""
+		if upload_id is not None and upload_id in self.uploads:
+			return 0
+		if isinstance(source, (str, os.PathLike)):
+			with open(source, "rb") as f:
+				fingerprint = file_fingerprint(f)
+		else:
+			fingerprint = file_fingerprint(source)
+		added = 0
+		if fingerprint not in self.fingerprints:
+			# Parse every chunk first so a bad row further down leaves the store untouched
+			chunks = [_typed(chunk) for chunk in pd.read_csv(source, chunksize=CSV_CHUNK_ROWS, dtype=COLUMN_DTYPES)]
+			for chunk in chunks:
+				self._append(chunk)
+				added += len(chunk)
+			self.fingerprints.add(fingerprint)
+		if upload_id is not None:
+			self.uploads[upload_id] = fingerprint
+		return added
@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import profit_engine
+from event_loader import LOADER_VERSION
+from rate_cache import CACHE_DIR
+from room_rate import normalize_names
+
+# Local history of every tutor-month the app or the batch runner has summarised, in one SQLite file.
+# Each month is ingested once per (workbook checksum, loader version, rate table digest, GST flag)
+# and kept only as a pre-aggregated cube: one row per tutor x month x school x tier with lesson
+# counts and money sums in int64 cents, plus distinct student numbers per tutor x month x school
+# (students are not additive across tiers). Multi-month and franchise-wide views read rollups of
+# these rows instead of re-downloading and re-cleaning workbooks.
+
+HISTORY_PATH = Path(os.environ.get("MUSIQHUB_HISTORY_DB", CACHE_DIR / "history.sqlite"))
+HISTORY_SCHEMA_VERSION = 1
+ROLLUP_CACHE_SIZE = int(os.environ.get("MUSIQHUB_HISTORY_CACHE_SIZE", "32"))
+CONNECT_TIMEOUT = 30  # seconds a connection waits on another process's write lock
+
+# Rollup dimensions and the SQL expression behind each
+DIMENSIONS = {
+	"tutor": "tutor",
+	"year": "substr(month, 1, 4)",
+	"month": "month",
+	"school": "school",
+	"tier": "tier",
+}
+CUBE_MEASURES = ["lessons", "tier_lessons", "billed", "gst", "room_hire", "profit", "support_fee"]
+MONEY_MEASURES = ["billed", "gst", "room_hire", "profit", "support_fee", "room_rate"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS months (
+	tutor TEXT NOT NULL,
+	month TEXT NOT NULL,
+	workbook TEXT NOT NULL,
+	loader INTEGER NOT NULL,
+	rates TEXT NOT NULL,
+	gst INTEGER NOT NULL,
+	lessons INTEGER NOT NULL,
+	ingested_at REAL NOT NULL,
+	PRIMARY KEY (tutor, month)
+);
+CREATE TABLE IF NOT EXISTS cube (
+	tutor TEXT NOT NULL,
+	month TEXT NOT NULL,
+	school TEXT NOT NULL,
+	tier INTEGER NOT NULL,
+	lessons INTEGER NOT NULL,
+	tier_lessons INTEGER NOT NULL,
+	billed INTEGER NOT NULL,
+	gst INTEGER NOT NULL,
+	room_hire INTEGER NOT NULL,
+	profit INTEGER NOT NULL,
+	support_fee INTEGER NOT NULL,
+	PRIMARY KEY (tutor, month, school, tier)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS students (
+	tutor TEXT NOT NULL,
+	month TEXT NOT NULL,
+	school TEXT NOT NULL,
+	students INTEGER NOT NULL,
+	room_rate INTEGER NOT NULL,
+	PRIMARY KEY (tutor, month, school)
+) WITHOUT ROWID;
+"""
+
+_lock = threading.Lock()
+_rollups = OrderedDict()
+
+
+def _migrate(conn):
+	# One writer at a time: BEGIN IMMEDIATE takes the write lock before the version is re-read, so a
+	# process that lost the race sees the schema the winner created instead of dropping it
+	conn.execute("BEGIN IMMEDIATE")
+	try:
+		version = conn.execute("PRAGMA user_version").fetchone()[0]
+		if version != HISTORY_SCHEMA_VERSION:
+			if version:
+				# Older layouts are dropped; months are re-ingested the next time they are summarised
+				for table in ("months", "cube", "students"):
+					conn.execute(f"DROP TABLE IF EXISTS {table}")
+			for statement in _SCHEMA.split(";"):
+				if statement.strip():
+					conn.execute(statement)
+			conn.execute(f"PRAGMA user_version = {HISTORY_SCHEMA_VERSION}")
+		conn.commit()
+	except BaseException:
+		conn.rollback()
+		raise
+
+
+def _connect():
+	HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+	# The batch runner's worker processes write concurrently; WAL plus a busy timeout serialises them
+	conn = sqlite3.connect(str(HISTORY_PATH), timeout=CONNECT_TIMEOUT)
+	deadline = time.monotonic() + CONNECT_TIMEOUT
+	while True:
+		try:
+			conn.execute("PRAGMA journal_mode=WAL")
+			if conn.execute("PRAGMA user_version").fetchone()[0] != HISTORY_SCHEMA_VERSION:
+				_migrate(conn)
+			return conn
+		except sqlite3.OperationalError as e:
+			# While another process switches a new file to WAL, SQLite reports "locked" without
+			# waiting on the busy timeout; that window is short, so retry
+			if "locked" not in str(e) or time.monotonic() > deadline:
+				conn.close()
+				raise
+			time.sleep(0.05)
+
+
+def cube_rows(students, enriched):
+	"""(cube, students) frames for one tutor-month from profit_engine.profit_stages output (cents)."""
+	school = normalize_names(enriched["School"]).str.title()
+	charged = (enriched[profit_engine.NET_FEE] != 0).to_numpy()
+	frame = pd.DataFrame({
+		"school": school.to_numpy(dtype=object),
+		"tier": np.asarray(enriched["Tier"], dtype=np.int64),
+		"lessons": 1,
+		# Lessons counted in the support-fee tiers: the ones with a net fee (see support_fees_by_tier)
+		"tier_lessons": charged.astype(np.int64),
+		"billed": enriched["Billed Amount"].to_numpy(dtype=np.int64),
+		"gst": enriched["GST Component"].to_numpy(dtype=np.int64),
+		"room_hire": enriched["Room Hire"].to_numpy(dtype=np.int64),
+		"profit": enriched["Profit"].to_numpy(dtype=np.int64),
+		"support_fee": np.where(charged, enriched["Tier Fee"].to_numpy(dtype=np.int64), 0),
+	})
+	cube = frame.groupby(["school", "tier"], sort=True)[CUBE_MEASURES].sum().reset_index()
+	per_school = pd.DataFrame({
+		"school": students["School"].to_numpy(dtype=object),
+		"students": students["Total Students"].to_numpy(dtype=np.int64),
+		"room_rate": students["Room Rate"].to_numpy(dtype=np.int64),
+	})
+	return cube, per_school
+
+
+def is_ingested(tutor, month, workbook, rate_table, apply_gst):
+	"""Whether this exact tutor-month (same workbook, loader, rates and GST flag) is already in the cube."""
+	with closing(_connect()) as conn:
+		row = conn.execute(
+			"SELECT workbook, loader, rates, gst FROM months WHERE tutor = ? AND month = ?", (tutor, month)
+		).fetchone()
+	return row == (workbook, LOADER_VERSION, rate_table.digest, int(bool(apply_gst)))
+
+
+def ingest_month(tutor, month, workbook, lessons, apply_gst, rate_table, stages=None):
+	"""Add one cleaned tutor-month to the cube, replacing any earlier version of it.
+
+	workbook: checksum of the source workbook. stages: profit_engine.profit_stages output if the
+	caller already has it. Returns False (and does nothing) if the month is already ingested as is.
+	"""
+	if is_ingested(tutor, month, workbook, rate_table, apply_gst):
+		metrics.cache_result("history.ingest", True)
+		return False
+	metrics.cache_result("history.ingest", False)
+	with metrics.span("history.ingest"):
+		students, _, _, enriched = stages or profit_engine.profit_stages(lessons, tutor, apply_gst, rate_table)
+		cube, per_school = cube_rows(students, enriched)
+		key = (tutor, month)
+		with _lock, closing(_connect()) as conn, conn:
+			conn.execute("DELETE FROM cube WHERE tutor = ? AND month = ?", key)
+			conn.execute("DELETE FROM students WHERE tutor = ? AND month = ?", key)
+			conn.executemany(
+				f"INSERT INTO cube VALUES (?, ?, ?, ?, {', '.join('?' * len(CUBE_MEASURES))})",
+				(key + (school, int(tier), *map(int, values)) for school, tier, *values in cube.itertuples(index=False)),
+			)
+			conn.executemany(
+				"INSERT INTO students VALUES (?, ?, ?, ?, ?)",
+				(key + (school, int(count), int(rate)) for school, count, rate in per_school.itertuples(index=False)),
+			)
+			conn.execute(
+				"INSERT OR REPLACE INTO months VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+				key + (workbook, LOADER_VERSION, rate_table.digest, int(bool(apply_gst)), len(enriched), time.time()),
+			)
+	return True
+
+
+def months():
+	"""Ingested tutor-months: tutor, month, workbook, loader, rates, gst, lessons, ingested_at."""
+	with closing(_connect()) as conn:
+		return pd.read_sql_query("SELECT * FROM months ORDER BY month, tutor", conn)
+
+
+def _where(tutors, start, end):
+	clauses, params = [], []
+	if tutors:
+		clauses.append(f"tutor IN ({', '.join('?' * len(tutors))})")
+		params.extend(tutors)
+	if start:
+		clauses.append("month >= ?")
+		params.append(start)
+	if end:
+		clauses.append("month <= ?")
+		params.append(end)
+	return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _query_rollup(conn, by, tutors, start, end):
+	where, params = _where(tutors, start, end)
+	select = ", ".join(f"{DIMENSIONS[d]} AS {d}" for d in by)
+	group = f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}" if by else ""
+	sums = ", ".join(f"SUM({m}) AS {m}" for m in CUBE_MEASURES)
+	cube = pd.read_sql_query(f"SELECT {select + ', ' if by else ''}{sums} FROM cube{where}{group}", conn, params=params)
+	if "tier" in by:
+		return cube
+	# Student numbers are summed over tutor-month-school rows: a student seen in two months counts twice
+	totals = pd.read_sql_query(
+		f"SELECT {select + ', ' if by else ''}SUM(students) AS students, SUM(room_rate) AS room_rate FROM students{where}{group}",
+		conn, params=params,
+	)
+	return cube.merge(totals, on=list(by), how="outer") if by else pd.concat([cube, totals], axis=1)
+
+
+def rollup(by=(), tutors=None, start=None, end=None):
+	"""Cube totals grouped by the given DIMENSIONS, optionally for some tutors and a month range.
+
+	start / end are inclusive "YYYY-MM" bounds. Measures are lesson counts and int64 cents; unless
+	grouped by tier, students and room_rate (sums over tutor-month-school rows) are added.
+	Results are cached until the next ingest; treat them as read-only.
+	"""
+	by = tuple(by)
+	unknown = [d for d in by if d not in DIMENSIONS]
+	if unknown:
+		raise ValueError(f"Unknown rollup dimension(s): {', '.join(unknown)}")
+	tutors = tuple(sorted(tutors)) if tutors else ()
+	with closing(_connect()) as conn:
+		# Any ingest, from this process or another, changes this stamp
+		stamp = conn.execute("SELECT COUNT(*), MAX(ingested_at) FROM months").fetchone()
+		key = (stamp, by, tutors, start, end)
+		with _lock:
+			if key in _rollups:
+				_rollups.move_to_end(key)
+				metrics.cache_result("history.rollup", True)
+				return _rollups[key]
+		metrics.cache_result("history.rollup", False)
+		with metrics.span("history.rollup"):
+			result = _query_rollup(conn, by, tutors, start, end)
+	measures = [c for c in result.columns if c not in by]
+	result[measures] = result[measures].fillna(0).astype(np.int64)
+	with _lock:
+		_rollups[key] = result
+		while len(_rollups) > ROLLUP_CACHE_SIZE:
+			_rollups.popitem(last=False)
+	return result
@@ -0,0 +1,153 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from atomic_file import atomic_write
+
+# Process-wide instrumentation: timed spans and counters.
+# Totals are cumulative for the process and can be exported as JSON or Prometheus text. Each thread
+# also keeps the spans and counters recorded since its last start_run(), which is how the app
+# shows a per-rerun breakdown (a Streamlit rerun executes on one script thread).
+
+METRICS_FILE = os.environ.get("MUSIQHUB_METRICS_FILE")
+METRIC_PREFIX = "musiqhub_"
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_spans = defaultdict(lambda: [0, 0.0])
+_local = threading.local()
+
+
+def _key(name, labels):
+	return (name, tuple(sorted(labels.items())))
+
+
+def _run():
+	run = getattr(_local, "run", None)
+	if run is None:
+		run = start_run()
+	return run
+
+
+def start_run():
+	"""Start a fresh per-run breakdown for the calling thread."""
+	_local.run = {"started": time.perf_counter(), "spans": [], "counters": defaultdict(float)}
+	return _local.run
+
+
+def run_breakdown():
+	"""(elapsed, spans, counters) for this thread since start_run(): seconds, [(name, seconds)], {(name, labels): value}."""
+	run = _run()
+	return time.perf_counter() - run["started"], list(run["spans"]), dict(run["counters"])
+
+
+def incr(name, value=1, **labels):
+	"""Add value to a counter, e.g. incr("drive_requests_total", kind="media")."""
+	key = _key(name, labels)
+	with _lock:
+		_counters[key] += value
+	_run()["counters"][key] += value
+
+
+def cache_result(cache, hit):
+	"""Count a hit or miss for a named cache."""
+	incr("cache_hits_total" if hit else "cache_misses_total", cache=cache)
+
+
+@contextmanager
+def span(name):
+	"""Time the with-block under name."""
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		elapsed = time.perf_counter() - start
+		with _lock:
+			total = _spans[name]
+			total[0] += 1
+			total[1] += elapsed
+		_run()["spans"].append((name, elapsed))
+
+
+def timed(name):
+	"""Decorator form of span()."""
+	def decorate(fn):
+		@wraps(fn)
+		def wrapper(*args, **kwargs):
+			with span(name):
+				return fn(*args, **kwargs)
+		return wrapper
+	return decorate
+
+
+def cache_ratios(counters=None):
+	"""{cache: (hits, misses)} from cumulative counters, or from a run_breakdown() counter dict."""
+	if counters is None:
+		with _lock:
+			counters = dict(_counters)
+	ratios = defaultdict(lambda: [0, 0])
+	for (name, labels), value in counters.items():
+		if name in ("cache_hits_total", "cache_misses_total"):
+			cache = dict(labels).get("cache", "")
+			ratios[cache][0 if name == "cache_hits_total" else 1] += int(value)
+	return {cache: tuple(hm) for cache, hm in sorted(ratios.items())}
+
+
+def snapshot():
+	"""Cumulative metrics as plain data."""
+	with _lock:
+		counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(_counters.items())]
+		spans = {name: {"count": count, "seconds": seconds} for name, (count, seconds) in sorted(_spans.items())}
+	return {"time": time.time(), "counters": counters, "spans": spans}
+
+
+def to_json():
+	return json.dumps(snapshot(), indent=2)
+
+
+def _metric_name(name):
+	return METRIC_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label_text(labels):
+	if not labels:
+		return ""
+	escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+	return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def to_prometheus():
+	"""Cumulative metrics in the Prometheus text exposition format."""
+	data = snapshot()
+	lines = []
+	by_name = defaultdict(list)
+	for c in data["counters"]:
+		by_name[c["name"]].append(c)
+	for name, samples in by_name.items():
+		metric = _metric_name(name)
+		lines.append(f"# TYPE {metric} counter")
+		lines.extend(f"{metric}{_label_text(s['labels'])} {s['value']:g}" for s in samples)
+	if data["spans"]:
+		lines.append(f"# TYPE {METRIC_PREFIX}span_seconds_total counter")
+		lines.extend(f'{METRIC_PREFIX}span_seconds_total{{span="{name}"}} {s["seconds"]:.6f}' for name, s in data["spans"].items())
+		lines.append(f"# TYPE {METRIC_PREFIX}span_count_total counter")
+		lines.extend(f'{METRIC_PREFIX}span_count_total{{span="{name}"}} {s["count"]}' for name, s in data["spans"].items())
+	return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_FILE):
+	"""Write cumulative metrics to path: Prometheus text for .prom/.txt, JSON otherwise."""
+	if not path:
+		return
+	text = to_prometheus() if str(path).endswith((".prom", ".txt")) else to_json()
+	try:
+		with atomic_write(path, "w", encoding="utf-8") as f:
+			f.write(text)
+	except OSError:
+		pass
+
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+# Fixed-point money: amounts are int64 cents from load time onwards.
+# Rounding rules are explicit and integer-only: to_cents and div_round round half away from zero,
+# so GST, per-student room hire and every total are exact and independent of float error.
+
+
+def to_cents(values):
+	"""Dollar amounts (numbers or numeric strings) as int64 cents; blanks and junk become 0."""
+	dollars = pd.to_numeric(pd.Series(values, copy=False), errors="coerce").fillna(0).to_numpy(dtype=float)
+	# Clear representation error first (0.285 * 100 == 28.499999...) so halves round as written
+	scaled = np.round(dollars * 100, 6)
+	return (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)).astype(np.int64)
+
+
+def div_round(numerator, denominator):
+	"""numerator / denominator on integers, rounded half away from zero (denominator > 0)."""
+	numerator = np.asarray(numerator, dtype=np.int64)
+	denominator = np.asarray(denominator, dtype=np.int64)
+	return np.sign(numerator) * ((2 * np.abs(numerator) + denominator) // (2 * denominator))
+
+
+def to_dollars(cents):
+	"""int64 cents as float dollars, for display and PDFs only."""
+	if isinstance(cents, pd.Series):
+		return cents.astype(float) / 100
+	return np.asarray(cents, dtype=float) / 100
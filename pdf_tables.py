@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Page-at-a-time tables for the combined PDF report (reports.py imports this on the first render).
+# A ReportLab Table measures every cell to size its columns and rows, then is split again and again
+# as it flows across pages, so a long table takes super-linear time and holds every cell string at
+# once. Here each frame becomes one TableRows flowable: column widths are computed once from the font
+# metrics of a sample of rows, every row has the same height, and rows are turned into strings (a
+# block of pages at a time) and into a small Table only when their page is drawn. Splitting at a page
+# break is arithmetic on row positions, so rendering time is linear in rows.
+
+SAMPLE_ROWS = 512  # rows measured per table for its column widths (all of them in smaller tables)
+TEXT_BLOCK_ROWS = 2048  # rows converted to text at a time; a page draws from the current block
+FONT = "Helvetica"
+BOLD_FONT = "Helvetica-Bold"
+FONT_SIZE = 8
+CELL_PADDING = 12  # ReportLab's default left plus right cell padding
+ROW_HEIGHT = 18  # one line at the default 12pt leading plus the default top and bottom padding
+
+BASE_STYLE = [
+	("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+	("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+	("FONTSIZE", (0, 0), (-1, -1), FONT_SIZE),
+	("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+	("FONTNAME", (0, 0), (-1, 0), BOLD_FONT),
+]
+
+
+def cell_text(df):
+	"""The frame's cells as printed: missing values blank, everything else str()."""
+	categorical = {c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}
+	return df.astype(categorical).fillna("").astype(str)
+
+
+def _is_number(value):
+	try:
+		float(value)
+		return True
+	except Exception:
+		return False
+
+
+def sample_positions(n, size=SAMPLE_ROWS):
+	"""Up to size row positions spread evenly over n rows, always including the first and last."""
+	return np.unique(np.linspace(0, n - 1, min(n, size)).round().astype(np.int64)) if n else np.array([], dtype=np.int64)
+
+
+def column_widths(df):
+	"""Column widths fitting the header and the sampled rows (the last, totals row in bold)."""
+	sample = cell_text(df.iloc[sample_positions(len(df))])
+	widths = []
+	for i, column in enumerate(sample.columns):
+		values = sample.iloc[:, i].tolist()
+		width = stringWidth(str(column), BOLD_FONT, FONT_SIZE)
+		if values:
+			width = max(width, stringWidth(values[-1], BOLD_FONT, FONT_SIZE), *(stringWidth(v, FONT, FONT_SIZE) for v in values[:-1]))
+		widths.append(width + CELL_PADDING)
+	return widths
+
+
+def table_style(df):
+	"""BASE_STYLE plus right alignment for columns whose first five values are numbers."""
+	style = list(BASE_STYLE)
+	for i, column in enumerate(df.columns):
+		non_null = df[column].dropna().head(5)
+		if not non_null.empty and all(_is_number(v) for v in non_null):
+			style.append(("ALIGN", (i, 1), (i, -1), "RIGHT"))
+	return style
+
+
+class _RowText:
+	"""Cell text of a frame, converted TEXT_BLOCK_ROWS rows at a time as pages ask for it."""
+
+	def __init__(self, df):
+		self.df = df
+		self.block = (0, 0, [])
+
+	def rows(self, start, stop):
+		first, last, text = self.block
+		if not (first <= start and stop <= last):
+			first, last = start, max(stop, min(start + TEXT_BLOCK_ROWS, len(self.df)))
+			text = cell_text(self.df.iloc[first:last]).values.tolist()
+			self.block = (first, last, text)
+		return text[start - first:stop - first]
+
+
+class TableRows(Flowable):
+	"""Rows [start, stop) of df drawn as one table under a repeated header row; splits between rows.
+
+	The last row of df (the totals row of the report tables) is drawn in bold.
+	"""
+
+	def __init__(self, df, widths=None, style=None, start=0, stop=None, text=None):
+		super().__init__()
+		self.df = df
+		self.text = _RowText(df) if text is None else text
+		self.widths = column_widths(df) if widths is None else widths
+		self.style = table_style(df) if style is None else style
+		self.start = start
+		self.stop = len(df) if stop is None else stop
+		self.hAlign = "LEFT"
+
+	def wrap(self, availWidth, availHeight):
+		# Tables wider than the frame run past the right margin rather than failing the layout
+		self.width = min(sum(self.widths), availWidth)
+		self.height = (self.stop - self.start + 1) * ROW_HEIGHT
+		return self.width, self.height
+
+	def split(self, availWidth, availHeight):
+		fit = int(availHeight // ROW_HEIGHT) - 1
+		if fit < 1 or fit >= self.stop - self.start:
+			return []
+		middle = self.start + fit
+		return [
+			TableRows(self.df, self.widths, self.style, self.start, middle, self.text),
+			TableRows(self.df, self.widths, self.style, middle, self.stop, self.text),
+		]
+
+	def draw(self):
+		data = [[str(c) for c in self.df.columns]] + self.text.rows(self.start, self.stop)
+		style = TableStyle(self.style)
+		if self.stop == len(self.df) > self.start:
+			style.add("FONTNAME", (0, -1), (-1, -1), BOLD_FONT)
+			style.add("TEXTCOLOR", (0, -1), (-1, -1), colors.black)
+		table = Table(data, colWidths=self.widths, rowHeights=[ROW_HEIGHT] * len(data), style=style)
+		table.wrapOn(self.canv, sum(self.widths), self.height)
+		table.drawOn(self.canv, 0, 0)
+
+
+def build(target, tables, title, page_size):
+	"""Lay out each (title, DataFrame) in tables as a heading and its TableRows, writing the PDF to target."""
+	doc = SimpleDocTemplate(target, pagesize=page_size, leftMargin=30, rightMargin=30, topMargin=40, bottomMargin=40, title=title)
+	styles = getSampleStyleSheet()
+	story = []
+	for heading, df in tables:
+		story.append(Paragraph(heading, styles["Heading3"]))
+		story.append(Spacer(1, 6))
+		story.append(TableRows(df))
+		story.append(Spacer(1, 12))
+	doc.build(story)
@@ -0,0 +1,247 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import frame_fingerprint
+import metrics
+import money
+import rate_resolver
+import tiers
+from room_rate import normalize_names
+
+# Event Profit Summary computation, free of Streamlit so the app and the batch runner share it.
+# Input is the cleaned lesson frame from event_loader; output is the three report tables plus the
+# lesson frame enriched with GST, room hire, net fee, tier and profit columns.
+# Every stage works on int64 cents (money.py) and the tables carry no Total rows; totals are
+# computed separately and only present() turns cents into dollars and appends Total rows.
+# cached_profit_summary runs the same steps as memoized stages keyed on fingerprints of their own
+# inputs, so a widget change only recomputes the stages downstream of it.
+
+NET_FEE = "Net Lesson Fee excl GST & Room Hire"
+HIDDEN_LESSON_COLUMNS = ["Duration", "Teacher Name", "Payroll Amount","Family", "Pre-Tax Billed Amount"]
+LESSON_MONEY_COLUMNS = ["Billed Amount", "GST Component", "Room Hire", NET_FEE, "Tier Fee", "Profit"]
+SCHOOL_SUM_COLUMNS = ["Lesson_Count", "Lesson Income", "GST", "Room Hire", "Net Income"]
+PROFIT_CACHE_SIZE = int(os.environ.get("MUSIQHUB_PROFIT_CACHE_SIZE", "32"))
+
+_lock = threading.Lock()
+_stages = {}
+
+
+def students_by_school(lessons, tutor_name, resolver):
+	"""Student numbers, room rate and per-student room hire per school, money in cents.
+
+	Returns (table, hire_by_norm) where hire_by_norm maps the normalized school name to the
+	per-student room hire used for each lesson row.
+	"""
+	# Count the number of unique students per room Description using a normalized key
+	exploded = lessons.explode("Student Name")
+	# Normalize descriptions to avoid duplicates like "St Marks" and "St Mark's"
+	exploded["Description_norm"] = normalize_names(exploded["Description"])
+	# Remove empty student name rows if any after explode
+	exploded["Student Name"] = exploded["Student Name"].astype(str).str.strip()
+	exploded = exploded[exploded["Student Name"].notna() & (exploded["Student Name"] != "")]
+
+	# Group by normalized description
+	table = exploded.groupby("Description_norm")["Student Name"].nunique().reset_index()
+	table.columns = ["Description_norm", "Total Students"]
+	# Friendly display name (title-cased) and room rate lookup
+	table["School"] = table["Description_norm"].str.title()
+	table["Room Rate"] = money.to_cents(resolver.resolve_many(table["Description_norm"], tutor_name))
+	# Room hire per student, rounded to the cent (half away from zero)
+	students = table["Total Students"].to_numpy(dtype=np.int64)
+	table["Room hire"] = np.where(students > 0, money.div_round(table["Room Rate"].to_numpy(), np.maximum(students, 1)), 0)
+	hire_by_norm = table.set_index("Description_norm")["Room hire"].to_dict()
+	# The school's whole room rate, not the per-student share times students (which carries its rounding)
+	table["Total Room Hire"] = np.where(students > 0, table["Room Rate"].to_numpy(), 0)
+	return table[["School", "Room Rate", "Total Students", "Room hire", "Total Room Hire"]], hire_by_norm
+
+
+def gst_component(billed, apply_gst):
+	"""GST included in each billed amount, in cents, or 0 for tutors not registered for GST."""
+	# GST is 3/23 of the GST-inclusive amount, rounded to the nearest cent
+	if apply_gst:
+		gst = money.div_round(billed.to_numpy() * 3, 23)
+	else:
+		gst = np.zeros(len(billed), dtype=np.int64)
+	return pd.Series(gst, index=billed.index)
+
+
+def room_hire_per_lesson(lessons, tutor_name, resolver, hire_by_norm):
+	"""Per-student room hire for each lesson row, in cents."""
+	# Use the per-student room hire by normalized description, otherwise fall back to the room rate (total)
+	description_norm = normalize_names(lessons["Description"])
+	room_hire = description_norm.map(hire_by_norm)
+	missing = room_hire.isna().to_numpy()
+	if missing.any():
+		room_hire[missing] = money.to_cents(resolver.resolve_many(lessons.loc[missing, "Description"], tutor_name))
+	return room_hire.fillna(0).astype(np.int64)
+
+
+def lesson_charges(lessons, gst, room_hire):
+	"""Lesson rows with GST Component, Room Hire and the net lesson fee (cents)."""
+	lessons = lessons.copy(deep=False)
+	billed = lessons["Billed Amount"]
+	lessons["GST Component"] = gst
+	lessons["Room Hire"] = room_hire
+	# Unbilled lessons have no net fee
+	lessons[NET_FEE] = (billed - gst - room_hire).where(billed != 0, 0)
+	lessons = lessons.rename(columns={"Description": "School"})
+	return lessons.drop(columns=[col for col in HIDDEN_LESSON_COLUMNS if col in lessons.columns])
+
+
+def support_fees_by_tier(lessons):
+	"""Classify lessons into support-fee tiers. Returns (lessons with Tier/Tier Fee, tier summary)."""
+	lessons = lessons.copy(deep=False)
+	# Classify the whole column in one pass, using the tier schedule in force on each lesson date
+	lessons["Tier"], lessons["Tier Fee"] = tiers.classify_cents(
+		lessons[NET_FEE],
+		dates=lessons["Event Date"] if "Event Date" in lessons.columns else None,
+	)
+	# Exclude rows where the net fee is zero (i.e., originally blank)
+	df_tier = lessons[lessons[NET_FEE] != 0]
+	summary = df_tier.groupby("Tier").agg(
+		Lesson_Count = (NET_FEE, "count"),
+		Tier_Fee = ("Tier Fee", "first")
+	).reset_index()
+
+	# Ensure every tier is present even if count is 0
+	missing_rows = [{"Tier": t, "Lesson_Count": 0, "Tier_Fee": tiers.tier_fee_cents(t)} for t in tiers.tier_numbers() if t not in set(summary["Tier"])]
+	if missing_rows:
+		summary = pd.concat([summary, pd.DataFrame(missing_rows)], ignore_index=True)
+	summary = summary.astype(np.int64).sort_values("Tier").reset_index(drop=True)
+	summary["Support Fee"] = summary["Lesson_Count"] * summary["Tier_Fee"]
+	return lessons, summary
+
+
+def profit_by_school(lessons):
+	"""Add the Profit column and return (lessons, revenue summary by school), money in cents."""
+	lessons = lessons.copy(deep=False)
+	lessons["Profit"] = lessons["Billed Amount"] - (lessons["GST Component"] + lessons["Room Hire"])
+
+	summary = lessons.groupby("School", observed=True).agg(
+		GST=("GST Component", "sum"),
+		Profit=("Profit", "sum"),
+		Billed=("Billed Amount", "sum"),
+		Room_Hire=("Room Hire", "sum"),
+		Lesson_Count=("School", "count"),
+	).reset_index()
+	summary = summary.rename(columns={"Profit": "Net Income", "Billed": "Lesson Income", "Room_Hire": "Room Hire"})
+	summary["School"] = summary["School"].astype(object)
+	return lessons, summary[["School"] + SCHOOL_SUM_COLUMNS]
+
+
+def summary_totals(students, tier_summary, profit):
+	"""Column totals of the three summary tables, kept apart from the tables themselves (cents and counts)."""
+	return {
+		"students": {col: int(students[col].sum()) for col in ["Room Rate", "Total Students", "Total Room Hire"]},
+		"tiers": {col: int(tier_summary[col].sum()) for col in ["Lesson_Count", "Support Fee"]},
+		"schools": {col: int(profit[col].sum()) for col in SCHOOL_SUM_COLUMNS},
+	}
+
+
+def _with_total(table, total_row):
+	return pd.concat([table, pd.DataFrame([total_row], columns=table.columns)], ignore_index=True)
+
+
+def display_tables(students, tier_summary, profit, totals):
+	"""Dollar-valued copies of the summary tables with their Total rows, for the page and the PDFs."""
+	students = students.assign(**{col: money.to_dollars(students[col]) for col in ["Room Rate", "Room hire", "Total Room Hire"]})
+	t = totals["students"]
+	students = _with_total(students, ["Total", t["Room Rate"] / 100, t["Total Students"], 0.0, t["Total Room Hire"] / 100])
+
+	tier_summary = tier_summary.assign(**{col: money.to_dollars(tier_summary[col]) for col in ["Tier_Fee", "Support Fee"]})
+	t = totals["tiers"]
+	tier_summary = _with_total(tier_summary, ["Total", t["Lesson_Count"], "", t["Support Fee"] / 100])
+
+	money_columns = [col for col in SCHOOL_SUM_COLUMNS if col != "Lesson_Count"]
+	profit = profit.assign(**{col: money.to_dollars(profit[col]) for col in money_columns})
+	t = totals["schools"]
+	profit = _with_total(profit, ["Total"] + [t[col] if col == "Lesson_Count" else t[col] / 100 for col in SCHOOL_SUM_COLUMNS])
+	return students, tier_summary, profit
+
+
+def display_lessons(lessons):
+	"""Lesson rows with money columns in dollars."""
+	return lessons.assign(**{col: money.to_dollars(lessons[col]) for col in LESSON_MONEY_COLUMNS if col in lessons.columns})
+
+
+def present(students, tier_summary, profit, enriched):
+	"""(students, tier_summary, profit, enriched, totals) ready for display; totals stay in cents."""
+	totals = summary_totals(students, tier_summary, profit)
+	return (*display_tables(students, tier_summary, profit, totals), display_lessons(enriched), totals)
+
+
+def profit_stages(lessons, tutor_name, apply_gst, rate_table):
+	"""The raw stage outputs for one tutor-month: (students, tier_summary, profit, enriched), in cents, no Total rows."""
+	resolver = rate_resolver.get_resolver(rate_table)
+	students, hire_by_norm = students_by_school(lessons, tutor_name, resolver)
+	room_hire = room_hire_per_lesson(lessons, tutor_name, resolver, hire_by_norm)
+	charged = lesson_charges(lessons, gst_component(lessons["Billed Amount"], apply_gst), room_hire)
+	tiered, tier_summary = support_fees_by_tier(charged)
+	enriched, profit = profit_by_school(tiered)
+	return students, tier_summary, profit, enriched
+
+
+def compute_profit_summary(lessons, tutor_name, apply_gst, rate_table):
+	"""Run the Event Profit Summary for one tutor-month.
+
+	lessons: cleaned lesson frame with int64-cent money columns (event_loader).
+	rate_table: compiled room rates (rate_table.RateTable).
+	Returns (students_by_school, tier_summary, profit_by_school, enriched_lessons, totals): the
+	frames in dollars with Total rows for display, totals in cents (see summary_totals).
+	"""
+	return present(*profit_stages(lessons, tutor_name, apply_gst, rate_table))
+
+
+def report_tables(students, tier_summary, profit):
+	"""The (title, table) list used for the combined PDF report."""
+	return [
+		# Remove "Total Room Hire" column from the students table for the combined report
+		("Students Numbers by School", students.drop(columns=["Total Room Hire"], errors="ignore")),
+		("MusiqHub Supports Fees by Tier", tier_summary),
+		("Review Summary by School", profit),
+	]
+
+
+def _stage(name, key, compute):
+	# One LRU per stage so a burst of keys in one stage does not evict another's entries
+	with _lock:
+		memo = _stages.setdefault(name, OrderedDict())
+		if key in memo:
+			memo.move_to_end(key)
+			metrics.cache_result(f"profit.{name}", True)
+			return memo[key]
+	metrics.cache_result(f"profit.{name}", False)
+	with metrics.span(f"profit.{name}"):
+		result = compute()
+	with _lock:
+		memo[key] = result
+		while len(memo) > PROFIT_CACHE_SIZE:
+			memo.popitem(last=False)
+	return result
+
+
+def cached_profit_summary(lessons, tutor_name, apply_gst, rate_table):
+	"""compute_profit_summary as a chain of memoized stages.
+
+	Student counts and room hire are keyed on (lessons, tutor, rate table digest), GST on (lessons, GST
+	flag), and charges, tiers, profit and the display frames on all of them. Flipping the GST checkbox reuses the
+	explode/groupby and every room-rate lookup. The returned frames are shared between callers;
+	treat them as read-only.
+	"""
+	resolver = rate_resolver.get_resolver(rate_table)
+	lessons_key = frame_fingerprint.fingerprint(lessons)
+	rates_key = (tutor_name, rate_table.digest)
+	gst_key = bool(apply_gst)
+	charges_key = (lessons_key, rates_key, gst_key)
+
+	students, hire_by_norm = _stage("students", (lessons_key, rates_key), lambda: students_by_school(lessons, tutor_name, resolver))
+	room_hire = _stage("room_hire", (lessons_key, rates_key), lambda: room_hire_per_lesson(lessons, tutor_name, resolver, hire_by_norm))
+	gst = _stage("gst", (lessons_key, gst_key), lambda: gst_component(lessons["Billed Amount"], gst_key))
+	charged = _stage("charges", charges_key, lambda: lesson_charges(lessons, gst, room_hire))
+	tiered, tier_summary = _stage("tiers", charges_key, lambda: support_fees_by_tier(charged))
+	enriched, profit = _stage("profit", charges_key, lambda: profit_by_school(tiered))
+	return _stage("display", charges_key, lambda: present(students, tier_summary, profit, enriched))
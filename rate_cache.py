@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import metrics
+import rate_table
+from atomic_file import atomic_write
+
+# Process-wide room-rate cache shared by every Streamlit session.
+# Entries are revalidated against Drive with a cheap files.get(modifiedTime, version)
+# call once the TTL expires and are persisted to disk so a restart or a Drive outage
+# still serves the last good table.
+
+CACHE_DIR = Path(os.environ.get("MUSIQHUB_CACHE_DIR", Path(__file__).resolve().parent / ".cache"))
+ROOM_RATE_TTL = int(os.environ.get("MUSIQHUB_ROOM_RATE_TTL", "300"))  # seconds
+
+_lock = threading.Lock()
+_entries = {}
+
+
+def _cache_path(file_id, sheet_name):
+	safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in f"{file_id}_{sheet_name}")
+	return CACHE_DIR / "room_rates" / f"{safe_id}.json"
+
+
+def _table_path(file_id, sheet_name):
+	# The compiled table sits next to its JSON metadata as a rate_table snapshot
+	return _cache_path(file_id, sheet_name).with_suffix(".bin")
+
+
+def _read_disk(file_id, sheet_name):
+	path = _cache_path(file_id, sheet_name)
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			data = json.load(f)
+		if "tables" in data:
+			# Written before tables were compiled: plain dicts, with (school, tutor) pairs as rows
+			tables = data["tables"]
+			table = rate_table.from_mappings(
+				{k: float(v) for k, v in tables["rates"].items()},
+				{(school, tutor): float(rate) for school, tutor, rate in tables["by_tutor"]},
+				tables["aliases"],
+			)
+		else:
+			table = rate_table.RateTable.load(_table_path(file_id, sheet_name), source=data["digest"])
+			if table is None:
+				return None
+		return {
+			"table": table,
+			"modifiedTime": data.get("modifiedTime"),
+			"version": data.get("version"),
+			"checked_at": float(data.get("checked_at", 0.0)),
+			"error": None,
+		}
+	except (OSError, ValueError, KeyError, TypeError):
+		return None
+
+
+def _write_disk(file_id, sheet_name, entry):
+	path = _cache_path(file_id, sheet_name)
+	try:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		# Table first, tagged with its digest, so the metadata never points at a table it does not match
+		entry["table"].save(_table_path(file_id, sheet_name), source=entry["table"].digest)
+		# Atomic swap so a concurrent reader never sees a half-written file, nor two writers one temp file
+		with atomic_write(path, "w", encoding="utf-8") as f:
+			json.dump({
+				"digest": entry["table"].digest,
+				"modifiedTime": entry["modifiedTime"],
+				"version": entry["version"],
+				"checked_at": entry["checked_at"],
+			}, f)
+	except OSError:
+		# Disk persistence is best effort; the in-memory entry still serves this process
+		pass
+
+
+def get_room_rates(service_factory, file_id, sheet_name, loader, ttl=ROOM_RATE_TTL):
+	"""Return the compiled RateTable, re-exporting the sheet only when Drive reports a change.
+
+	loader(file_id, sheet_name) must return a RateTable (e.g. room_rate.room_rates_from_xlsx).
+
+	Raises only when Drive is unreachable and no cached copy exists in memory or on disk.
+	"""
+	key = (file_id, sheet_name)
+	# One lock for all sessions: concurrent reruns wait for a single export instead of each starting one
+	with _lock:
+		entry = _entries.get(key)
+		if entry is None:
+			entry = _read_disk(file_id, sheet_name)
+			if entry is not None:
+				_entries[key] = entry
+		now = time.time()
+		if entry is not None and now - entry["checked_at"] < ttl:
+			metrics.cache_result("room_rates", True)
+			return entry["table"]
+
+		try:
+			service = service_factory()
+			meta = service.files().get(fileId=file_id, fields="modifiedTime,version").execute()
+			if entry is not None and meta.get("modifiedTime") == entry["modifiedTime"] and meta.get("version") == entry["version"]:
+				entry["checked_at"] = now
+				entry["error"] = None
+				_write_disk(file_id, sheet_name, entry)
+				metrics.cache_result("room_rates", True)
+				return entry["table"]
+			metrics.cache_result("room_rates", False)
+			with metrics.span("rates.load"):
+				table = loader(file_id, sheet_name)
+		except Exception as e:
+			if entry is None:
+				raise
+			# Serve the last good table and retry on the next TTL expiry
+			entry["checked_at"] = now
+			entry["error"] = str(e)
+			return entry["table"]
+
+		entry = {
+			"table": table,
+			"modifiedTime": meta.get("modifiedTime"),
+			"version": meta.get("version"),
+			"checked_at": now,
+			"error": None,
+		}
+		_entries[key] = entry
+		_write_disk(file_id, sheet_name, entry)
+		return table
+
+
+def peek_room_rates(file_id, sheet_name):
+	"""Return the cached RateTable (memory, then disk) however old, without calling Drive; None if never loaded.
+
+	Never waits on a load in progress, so a rerun can paint while get_room_rates runs in the background.
+	"""
+	key = (file_id, sheet_name)
+	entry = _entries.get(key)
+	if entry is None:
+		entry = _read_disk(file_id, sheet_name)
+		if entry is None:
+			return None
+		# Adopt the disk copy only if no load holds the lock; otherwise it will install its own
+		if _lock.acquire(blocking=False):
+			try:
+				entry = _entries.setdefault(key, entry)
+			finally:
+				_lock.release()
+	return entry["table"]
+
+
+def room_rate_status(file_id, sheet_name):
+	"""Return cache metadata for the sheet (modifiedTime, version, checked_at, error) or None if never loaded."""
+	entry = _entries.get((file_id, sheet_name))
+	if entry is None:
+		return None
+	return {k: entry[k] for k in ("modifiedTime", "version", "checked_at", "error")}
+
+
+def invalidate_room_rates(file_id=None, sheet_name=None):
+	"""Force the next get_room_rates call to revalidate against Drive."""
+	with _lock:
+		for key, entry in _entries.items():
+			if file_id is None or key == (file_id, sheet_name):
+				entry["checked_at"] = 0.0
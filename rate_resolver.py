@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from room_rate import normalize_name, normalize_names, normalize_tutor_name
+
+# Room-rate lookup over a compiled RateTable (rate_table.py).
+# Exact, alias and tutor-specific matches are array lookups on the table; a character trigram
+# index narrows the fuzzy fallback to a handful of candidate schools instead of running
+# SequenceMatcher against every key. Results are memoized per (description, tutor), and
+# get_resolver keeps one resolver per recently used table.
+
+NGRAM = 3
+FUZZY_CANDIDATES = 8
+FUZZY_CUTOFF = 0.7
+MEMO_SIZE = 4096
+RESOLVER_CACHE_SIZE = 4
+
+
+def _ngrams(s):
+	padded = f"  {s} "
+	return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+class RoomRateResolver:
+	def __init__(self, table, memo_size=MEMO_SIZE):
+		self.table = table
+		# Fuzzy matches only land on schools that have a rate of their own
+		self._fuzzy_rates = dict(zip(table.schools[table.has_rate], table.defaults[table.has_rate]))
+		self._grams = defaultdict(list)
+		for key in self._fuzzy_rates:
+			for g in _ngrams(key):
+				self._grams[g].append(key)
+		self._memo = OrderedDict()
+		self._memo_size = memo_size
+		self._lock = threading.Lock()
+
+	def _fuzzy_candidates(self, norm):
+		counts = defaultdict(int)
+		for g in _ngrams(norm):
+			for key in self._grams.get(g, ()):
+				counts[key] += 1
+		return sorted(counts, key=counts.get, reverse=True)[:FUZZY_CANDIDATES]
+
+	def _fuzzy(self, norm):
+		# fuzzy match against the few keys sharing the most trigrams
+		from difflib import get_close_matches
+		match = get_close_matches(norm, self._fuzzy_candidates(norm), n=1, cutoff=FUZZY_CUTOFF)
+		return self._fuzzy_rates[match[0]] if match else 0.0
+
+	def _remember(self, key, rate):
+		with self._lock:
+			self._memo[key] = rate
+			if len(self._memo) > self._memo_size:
+				self._memo.popitem(last=False)
+
+	def resolve(self, description, tutor="", use_fuzzy=True):
+		"""Return the room rate for a description, optionally tutor-specific."""
+		key = (description, tutor, use_fuzzy)
+		with self._lock:
+			if key in self._memo:
+				self._memo.move_to_end(key)
+				return self._memo[key]
+		norm = normalize_name(description)
+		rate = self.table.rate(norm, normalize_tutor_name(tutor) if tutor else "")
+		if np.isnan(rate):
+			rate = self._fuzzy(norm) if use_fuzzy and norm else 0.0
+		rate = float(rate)
+		self._remember(key, rate)
+		return rate
+
+	def resolve_many(self, descriptions, tutor="", use_fuzzy=True):
+		"""Resolve an array of descriptions in one call; each distinct description is looked up once."""
+		with metrics.span("rates.resolve"):
+			codes, uniques = pd.factorize(pd.Series(descriptions, copy=False), use_na_sentinel=True)
+			uniques = pd.Series(uniques, dtype=object)
+			# Exact and alias matches for every distinct name in one vectorized lookup
+			unique_rates = self.table.lookup(normalize_names(uniques).to_numpy(), normalize_tutor_name(tutor) if tutor else "")
+			for i in np.flatnonzero(np.isnan(unique_rates)):
+				unique_rates[i] = self.resolve(uniques.iloc[i], tutor, use_fuzzy)
+			unique_rates = np.append(unique_rates, 0.0)
+		# NaN descriptions get code -1, which indexes the trailing 0.0
+		return unique_rates[codes]
+
+
+_lock = threading.Lock()
+_resolvers = OrderedDict()  # RateTable digest -> resolver, least recently used first
+
+
+def get_resolver(table):
+	"""Return the resolver for this RateTable, building one only for a table content not seen recently.
+
+	The last RESOLVER_CACHE_SIZE tables keep their resolvers (and memos), so switching between the
+	built-in and sheet rates, or a caller passing its own table, does not rebuild the index.
+	"""
+	with _lock:
+		resolver = _resolvers.get(table.digest)
+		if resolver is not None:
+			_resolvers.move_to_end(table.digest)
+			return resolver
+		resolver = _resolvers[table.digest] = RoomRateResolver(table)
+		while len(_resolvers) > RESOLVER_CACHE_SIZE:
+			_resolvers.popitem(last=False)
+		return resolver
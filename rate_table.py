@@ -0,0 +1,253 @@
+import hashlib
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from atomic_file import atomic_write
+
+# Compiled, frozen room-rate table shared by every lookup path.
+# Schools and tutors are normalized once and sorted into two axes; rates live in a dense
+# school x tutor float array (NaN where a tutor has no rate for a school) next to one default rate
+# per school, and aliases are stored as codes into the school axis. Both sources, the live Google
+# Sheet and the CSV embedded in room_rate.py, go through compile_rates, so they follow one rule:
+# a school's default is its blank-tutor row if the sheet has one, otherwise the lowest rate any
+# tutor pays there (a $0 rate therefore wins). Tables are content-hashed and saved as flat snapshot files
+# (JSON header plus raw array bytes) that load in tens of microseconds.
+
+RATE_TABLE_VERSION = 1
+
+
+def parse_rates(values):
+	"""Rate cells ("$1,234.50", 12.5, blanks, junk) as float dollars; anything unparsable is 0."""
+	text = pd.Series(values, copy=False).astype(str).str.replace(r"[$,\s]", "", regex=True)
+	return pd.to_numeric(text, errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+def _text_digest(h, names):
+	h.update("\x1f".join(names).encode("utf-8"))
+	h.update(b"\x1e")
+
+
+class RateTable:
+	"""Frozen room-rate table. Build it with compile_rates or from_mappings, never by hand."""
+
+	def __init__(self, schools, tutors, rates, defaults, alias_names, alias_codes, digest=None):
+		self.schools = np.asarray(schools, dtype=object)  # normalized, sorted
+		self.tutors = np.asarray(tutors, dtype=object)  # normalized, sorted; "" is the blank-tutor row
+		self.rates = np.asarray(rates, dtype=float).reshape(len(self.schools), len(self.tutors))
+		self.defaults = np.asarray(defaults, dtype=float)  # NaN for schools known only as alias targets
+		self.alias_names = np.asarray(alias_names, dtype=object)  # normalized, sorted
+		self.alias_codes = np.asarray(alias_codes, dtype=np.int32)  # index into schools
+		for array in (self.schools, self.tutors, self.rates, self.defaults, self.alias_names, self.alias_codes):
+			array.flags.writeable = False
+		self.digest = digest or self._content_digest()
+		self._indexes = None
+		self._codes = None
+
+	def _content_digest(self):
+		h = hashlib.sha256(f"rate-table-v{RATE_TABLE_VERSION}".encode())
+		_text_digest(h, self.schools)
+		_text_digest(h, self.tutors)
+		_text_digest(h, self.alias_names)
+		for array in (self.rates, self.defaults, self.alias_codes):
+			h.update(np.ascontiguousarray(array).tobytes())
+		return h.hexdigest()
+
+	def __repr__(self):
+		return f"RateTable({len(self.schools)} schools, {len(self.tutors)} tutors, {len(self.alias_names)} aliases, {self.digest[:12]})"
+
+	def __getstate__(self):
+		# The hash indexes are rebuilt on first use; worker processes get the arrays only
+		state = dict(self.__dict__)
+		state["_indexes"] = state["_codes"] = None
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+
+	def _index(self):
+		# Hash indexes for the vectorized path, built on first use
+		if self._indexes is None:
+			self._indexes = (pd.Index(self.schools), pd.Index(self.tutors), pd.Index(self.alias_names))
+		return self._indexes
+
+	def _maps(self):
+		# Plain dicts for one-name lookups, where a pandas call would cost more than the lookup
+		if self._codes is None:
+			self._codes = (
+				{name: i for i, name in enumerate(self.schools)},
+				{name: i for i, name in enumerate(self.tutors)},
+				dict(zip(self.alias_names, self.alias_codes.tolist())),
+			)
+		return self._codes
+
+	@property
+	def has_rate(self):
+		"""Mask of schools with a default rate (alias-only targets have none)."""
+		return ~np.isnan(self.defaults)
+
+	def lookup(self, school_norms, tutor_norm=""):
+		"""Rates for normalized school names, following aliases; NaN where there is no match.
+
+		Per name: the tutor's own rate for the name, then the tutor's rate for the alias target,
+		then the target's default rate.
+		"""
+		names = pd.Index(np.asarray(school_norms, dtype=object))
+		if not len(self.schools):
+			return np.full(len(names), np.nan)
+		schools, tutors, aliases = self._index()
+		codes = schools.get_indexer(names)
+		target = codes
+		if len(self.alias_names):
+			alias = aliases.get_indexer(names)
+			target = np.where(alias >= 0, self.alias_codes[alias], codes)
+		result = np.full(len(names), np.nan)
+		known = target >= 0
+		result[known] = self.defaults[target[known]]
+		tutor = tutors.get_indexer([tutor_norm])[0] if tutor_norm else -1
+		if tutor >= 0:
+			column = self.rates[:, tutor]
+			via_alias = np.where(known, column[np.maximum(target, 0)], np.nan)
+			result = np.where(np.isnan(via_alias), result, via_alias)
+			direct = np.where(codes >= 0, column[np.maximum(codes, 0)], np.nan)
+			result = np.where(np.isnan(direct), result, direct)
+		return result
+
+	def rate(self, school_norm, tutor_norm=""):
+		"""lookup() for one normalized name."""
+		schools, tutors, aliases = self._maps()
+		code = schools.get(school_norm, -1)
+		tutor = tutors.get(tutor_norm, -1) if tutor_norm else -1
+		target = aliases.get(school_norm, code)
+		if tutor >= 0:
+			for c in (code, target):
+				if c >= 0 and not np.isnan(self.rates[c, tutor]):
+					return float(self.rates[c, tutor])
+		return float(self.defaults[target]) if target >= 0 else np.nan
+
+	# --- dict views for callers that still want the old (ROOM_RATES, ROOM_RATES_BY_TUTOR, ALIASES) shape ---
+
+	def rates_dict(self):
+		return {s: float(r) for s, r in zip(self.schools[self.has_rate], self.defaults[self.has_rate])}
+
+	def by_tutor_dict(self):
+		s, t = np.nonzero(~np.isnan(self.rates))
+		return {(self.schools[i], self.tutors[j]): float(self.rates[i, j]) for i, j in zip(s, t)}
+
+	def aliases_dict(self):
+		return dict(zip(self.alias_names, self.schools[self.alias_codes]))
+
+	# --- snapshots ---
+	# Layout: 4-byte little-endian header length, a JSON header (version, digest, source, names,
+	# shapes), then the raw rates / defaults / alias_codes buffers. Loading is one read, one small
+	# json.loads and zero-copy np.frombuffer views.
+
+	def save(self, path, source=""):
+		"""Write the table as a snapshot file (atomically). source is an optional caller tag, e.g. an input digest."""
+		header = json.dumps({
+			"version": RATE_TABLE_VERSION,
+			"digest": self.digest,
+			"source": source,
+			"schools": self.schools.tolist(),
+			"tutors": self.tutors.tolist(),
+			"alias_names": self.alias_names.tolist(),
+		}).encode("utf-8")
+		with atomic_write(path) as f:
+			f.write(struct.pack("<I", len(header)))
+			f.write(header)
+			for array in (self.rates.astype("<f8"), self.defaults.astype("<f8"), self.alias_codes.astype("<i4")):
+				f.write(np.ascontiguousarray(array).tobytes())
+
+	@classmethod
+	def load(cls, path, source=None):
+		"""Read a snapshot; None if it is missing, unreadable, from another RATE_TABLE_VERSION or (when given) another source."""
+		try:
+			with open(path, "rb") as f:
+				data = f.read()
+			(size,) = struct.unpack_from("<I", data)
+			header = json.loads(data[4:4 + size])
+			if header["version"] != RATE_TABLE_VERSION or (source is not None and header["source"] != source):
+				return None
+			n_schools, n_tutors, n_aliases = len(header["schools"]), len(header["tutors"]), len(header["alias_names"])
+			offset = 4 + size
+			rates = np.frombuffer(data, dtype="<f8", count=n_schools * n_tutors, offset=offset)
+			offset += rates.nbytes
+			defaults = np.frombuffer(data, dtype="<f8", count=n_schools, offset=offset)
+			alias_codes = np.frombuffer(data, dtype="<i4", count=n_aliases, offset=offset + defaults.nbytes)
+			return cls(header["schools"], header["tutors"], rates, defaults, header["alias_names"], alias_codes, digest=header["digest"])
+		except (OSError, ValueError, KeyError, TypeError, struct.error):
+			return None
+
+
+def _alias_arrays(aliases):
+	# aliases: {alias: school} or (alias, school) pairs; blank aliases are dropped, the last one wins
+	from room_rate import normalize_names
+
+	pairs = list(aliases.items()) if hasattr(aliases, "items") else list(aliases)
+	if not pairs:
+		return np.array([], dtype=object), np.array([], dtype=object)
+	frame = pd.DataFrame({
+		"alias": normalize_names([a for a, _ in pairs]).to_numpy(),
+		"target": normalize_names([s for _, s in pairs]).to_numpy(),
+	})
+	frame = frame[(frame["alias"] != "") & (frame["target"] != "")].drop_duplicates("alias", keep="last")
+	return frame["alias"].to_numpy(dtype=object), frame["target"].to_numpy(dtype=object)
+
+
+def _build(school_col, tutor_col, rate_col, alias_names, alias_targets, defaults=None):
+	# Shared tail of compile_rates and from_mappings: axes, dense array, default rates, alias codes.
+	# defaults: (school names, rates) to use as given; None derives them from the rows.
+	default_names = () if defaults is None else defaults[0]
+	schools = pd.Index(sorted(set(school_col) | set(alias_targets) | set(default_names)), dtype=object)
+	tutors = pd.Index(sorted(set(tutor_col)), dtype=object)
+	s_codes = schools.get_indexer(school_col)
+	rates = np.full((len(schools), len(tutors)), np.nan)
+	rates[s_codes, tutors.get_indexer(tutor_col)] = rate_col
+	default_rates = np.full(len(schools), np.nan)
+	if defaults is None:
+		# Lowest rate any tutor pays at the school, overridden by an explicit blank-tutor row
+		lowest = pd.Series(rate_col, dtype=float).groupby(s_codes).min()
+		default_rates[lowest.index.to_numpy()] = lowest.to_numpy()
+		if len(tutors) and tutors[0] == "":
+			default_rates = np.where(np.isnan(rates[:, 0]), default_rates, rates[:, 0])
+	else:
+		default_rates[schools.get_indexer(default_names)] = defaults[1]
+	order = np.argsort(alias_names, kind="stable")
+	return RateTable(
+		schools.to_numpy(), tutors.to_numpy(), rates, default_rates,
+		alias_names[order], schools.get_indexer(alias_targets[order]),
+	)
+
+
+def compile_rates(tutors, schools, rates, aliases=()):
+	"""Compile parallel tutor / school / rate columns (raw sheet values) into a RateTable.
+
+	Names are normalized and rates parsed column-wise; a repeated (school, tutor) pair keeps its
+	last rate and rows without a school are dropped. aliases maps raw alias names to raw school names.
+	"""
+	from room_rate import normalize_names, normalize_tutor_names
+
+	frame = pd.DataFrame({
+		"school": normalize_names(pd.Series(schools, copy=False).reset_index(drop=True)).to_numpy(),
+		"tutor": normalize_tutor_names(pd.Series(tutors, copy=False).reset_index(drop=True)).to_numpy(),
+		"rate": parse_rates(pd.Series(rates, copy=False).reset_index(drop=True)),
+	})
+	frame = frame[frame["school"] != ""].drop_duplicates(["school", "tutor"], keep="last")
+	return _build(
+		frame["school"].to_numpy(dtype=object), frame["tutor"].to_numpy(dtype=object), frame["rate"].to_numpy(),
+		*_alias_arrays(aliases),
+	)
+
+
+def from_mappings(rates, by_tutor, aliases):
+	"""RateTable from the old (ROOM_RATES, ROOM_RATES_BY_TUTOR, ALIASES) dicts, keeping their default rates as given."""
+	pairs = list(by_tutor.items())
+	return _build(
+		np.array([s for (s, _), _ in pairs], dtype=object),
+		np.array([t for (_, t), _ in pairs], dtype=object),
+		np.array([r for _, r in pairs], dtype=float),
+		*_alias_arrays(aliases),
+		defaults=(list(rates), np.array(list(rates.values()), dtype=float)),
+	)
@@ -0,0 +1,125 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import metrics
+
+# PDF report rendering.
+# Rendering is expensive (full ReportLab layout of every table), so the app only renders when a
+# download button is clicked and the bytes are memoized under a hash of the table contents,
+# title and orientation. Re-clicking, or toggling a widget that does not change a table, is a hit.
+# The combined report's tables are laid out a page of rows at a time (pdf_tables), so long tables
+# cost time linear in their rows. Memory still grows with the page count: ReportLab keeps every
+# page's drawing commands until the document is saved, and the app receives the finished PDF as bytes.
+# ReportLab itself is imported on the first render, keeping it off the app's start-up path.
+
+PDF_CACHE_SIZE = 32
+
+_lock = threading.Lock()
+_pdf_cache = OrderedDict()
+
+
+@metrics.timed("report.table_pdf")
+def dataframe_to_pdf_bytes(df, title="Data"):
+		from reportlab.lib import colors
+		from reportlab.lib.pagesizes import A4, landscape as rl_landscape
+		from reportlab.pdfgen import canvas
+		from reportlab.platypus import Table, TableStyle
+
+		buffer = io.BytesIO()
+		# Use landscape A4
+		page_size = rl_landscape(A4)
+		c = canvas.Canvas(buffer, pagesize=page_size)
+		width, height = page_size
+		c.setFont("Helvetica-Bold", 13)
+		c.drawString(30, height - 40, title)
+		c.setFont("Helvetica", 10)
+
+		# Prepare data for Table (header + rows)
+		data = [list(df.columns)] + df.astype(str).values.tolist()
+
+		# Create Table
+		table = Table(data)
+		table.setStyle(TableStyle([
+				('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+				('TEXTCOLOR', (0,0), (-1,0), colors.black),
+				('ALIGN', (0,0), (-1,-1), 'LEFT'),
+				('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+				('FONTSIZE', (0,0), (-1,-1), 8),
+				('BOTTOMPADDING', (0,0), (-1,0), 8),
+				('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+		]))
+
+		# Calculate table width and height
+		table_width, table_height = table.wrapOn(c, width-60, height-100)
+		table.drawOn(c, 30, height - 60 - table_height)
+
+		c.save()
+		buffer.seek(0)
+		return buffer.read()
+
+@metrics.timed("report.combined_pdf")
+def write_combined_pdf(target, tables, title="Report", orientation="portrait"):
+	"""Write a single multi-page PDF containing each (title, DataFrame) in tables to target.
+
+	target: a path or a binary file object. Tables are laid out a page of rows at a time (see
+	pdf_tables), so render time is linear in rows; ReportLab holds all pages until the file is written.
+	"""
+	from reportlab.lib.pagesizes import A4, landscape as rl_landscape
+
+	import pdf_tables
+
+	if isinstance(target, os.PathLike):
+		target = os.fspath(target)  # ReportLab accepts str paths or file objects only
+	page_size = rl_landscape(A4) if orientation == "landscape" else A4
+	pdf_tables.build(target, tables, title, page_size)
+
+
+def make_combined_pdf_bytes(tables, title="Report", orientation="portrait"):
+	"""write_combined_pdf, returning the whole PDF as bytes (for st.download_button).
+
+	Callers that can take a file, like batch_report, should use write_combined_pdf instead.
+	"""
+	buffer = io.BytesIO()
+	write_combined_pdf(buffer, tables, title, orientation)
+	return buffer.getvalue()
+
+
+def frame_fingerprint(df):
+	"""Cheap content hash of a table as it will be printed (columns, dtypes and string values)."""
+	h = hashlib.sha1()
+	h.update(repr(list(df.columns)).encode())
+	h.update(repr([str(t) for t in df.dtypes]).encode())
+	h.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+	return h.hexdigest()
+
+
+def _memoized(key, render):
+	with _lock:
+		if key in _pdf_cache:
+			_pdf_cache.move_to_end(key)
+			metrics.cache_result("pdf", True)
+			return _pdf_cache[key]
+	metrics.cache_result("pdf", False)
+	data = render()
+	with _lock:
+		_pdf_cache[key] = data
+		while len(_pdf_cache) > PDF_CACHE_SIZE:
+			_pdf_cache.popitem(last=False)
+	return data
+
+
+def table_pdf_bytes(df, title="Data"):
+	"""Memoized dataframe_to_pdf_bytes."""
+	key = ("table", title, frame_fingerprint(df))
+	return _memoized(key, lambda: dataframe_to_pdf_bytes(df, title=title))
+
+
+def combined_pdf_bytes(tables, title="Report", orientation="portrait"):
+	"""Memoized make_combined_pdf_bytes."""
+	key = ("combined", title, orientation, tuple((t, frame_fingerprint(df)) for t, df in tables))
+	return _memoized(key, lambda: make_combined_pdf_bytes(tables, title, orientation))
@@ -1,6 +1,13 @@
+import csv
+import hashlib
+import io
+import os
+import numpy as np
 import pandas as pd
 import re
 
+import rate_table
+
 def normalize_name(name: str) -> str:
     if not name or pd.isna(name):
         return ""
@@ -15,9 +22,51 @@ def normalize_tutor_name(name: str) -> str:
         return ""
     return str(name).strip().lower().replace(" ", "")
 
+def _normalize_batch(values, normalize_uniques):
+    # Factorize first so the string work runs once per distinct value, then map back by code.
+    # Lesson sheets repeat a few dozen schools across thousands of rows.
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+    blank = np.fromiter((not v for v in uniques), dtype=bool, count=len(uniques))
+    normalized = normalize_uniques(uniques.astype(str)).where(~blank, "")
+    # Missing values get code -1, which indexes the trailing ""
+    lookup = np.append(normalized.to_numpy(dtype=object), "")
+    return pd.Series(lookup[codes], index=series.index, dtype=object)
+
+def normalize_names(values) -> pd.Series:
+    """Batch form of normalize_name for a column of names."""
+    return _normalize_batch(values, lambda s: (
+        s.str.strip().str.lower()
+        .str.replace(r"[’'`]", "", regex=True)
+        .str.replace(r"[^0-9a-z\s]", " ", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    ))
+
+def normalize_tutor_names(values) -> pd.Series:
+    """Batch form of normalize_tutor_name for a column of tutor names."""
+    return _normalize_batch(values, lambda s: s.str.strip().str.lower().str.replace(" ", "", regex=False))
+
+# Google Sheet holding the live room rates (exported as xlsx by the app and the batch runner)
+ROOM_RATE_FILE_ID = "1m2wgs_voZy4IaRs6BmmiPXZGm7-PyaA817fRdUTGujQ"
+ROOM_RATE_SHEET = "Sheet1"
+
+def room_rates_from_sheet(df):
+    """Compile the room-rate sheet frame into a RateTable (its School Abbreviation column gives the aliases)."""
+    return rate_table.compile_rates(
+        df["Franchisee Name"], df["School Name"], df["Room Rate per Week"],
+        aliases=zip(df["School Abbreviation"], df["School Name"]),
+    )
+
+def room_rates_from_xlsx(source, sheet_name=ROOM_RATE_SHEET):
+    """Compile the room-rate table from an xlsx export of the sheet (path, file-like or bytes)."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return room_rates_from_sheet(pd.read_excel(source, sheet_name=sheet_name))
+
 # Usage example:
-# file_id = "1m2wgs_voZy4IaRs6BmmiPXZGm7-PyaA817fRdUTGujQ"  # Your spreadsheet file ID
-# ROOM_RATES, ROOM_RATES_BY_TUTOR, ALIASES = load_room_rates_from_gdrive(file_id)
+# table = room_rates_from_xlsx("room_rates.xlsx"); table.rate("sunnyhills school", "barrylee")
 
 # Data from room_rate.md
 room_rate_raw = '''franchisee name, school name,room rate per week
@@ -174,53 +223,13 @@ scottwotherspoon,new windsor school,$0.00
 scottwotherspoon,golden grove school,$0.00
 waynemortensen,tahatai coast school,$0.00'''.strip().splitlines()
 
-import csv
-from collections import defaultdict
-
-ROOM_RATES_BY_TUTOR = {}
-ROOM_RATES = {}
-lowest_rate_per_school = {}
-zero_rate_schools = set()
-
-reader = csv.reader(room_rate_raw)
-header = next(reader)
-for row in reader:
-    tutor, school, rate = row
-    tutor_norm = normalize_tutor_name(tutor)
-    school_norm = normalize_name(school)
-    # Remove $ and convert to float
-    rate_val = float(rate.replace("$", "").replace(",", ""))
-    # Tutor-specific
-    ROOM_RATES_BY_TUTOR[(school_norm, tutor_norm)] = rate_val
-    # Track if any tutor for this school has a $0 rate
-    if rate_val == 0:
-        zero_rate_schools.add(school_norm)
-    # For ROOM_RATES, keep the lowest nonzero rate for each school
-    if school_norm not in lowest_rate_per_school:
-        lowest_rate_per_school[school_norm] = rate_val
-    else:
-        if rate_val != 0 and (lowest_rate_per_school[school_norm] == 0 or rate_val < lowest_rate_per_school[school_norm]):
-            lowest_rate_per_school[school_norm] = rate_val
-# If any tutor for a school has a $0 rate, set ROOM_RATES[school] = 0
-for school_norm in lowest_rate_per_school:
-    if school_norm in zero_rate_schools:
-        ROOM_RATES[school_norm] = 0.0
-    else:
-        ROOM_RATES[school_norm] = lowest_rate_per_school[school_norm]
-
 def get_room_rate(school, tutor=None):
     """
-    Returns the room rate for a given school and (optionally) tutor.
+    Returns the built-in room rate for a given school and (optionally) tutor.
     If not found, returns 0.
     """
-    school_norm = normalize_name(school)
-    if tutor is not None:
-        tutor_norm = normalize_tutor_name(tutor)
-        rate = ROOM_RATES_BY_TUTOR.get((school_norm, tutor_norm))
-        if rate is not None:
-            return rate
-    # Fallback to default rate for the school
-    return ROOM_RATES.get(school_norm, 0)
+    rate = BUILTIN_RATES.rate(normalize_name(school), normalize_tutor_name(tutor) if tutor is not None else "")
+    return 0.0 if np.isnan(rate) else rate
 
 # Aliases (unchanged)
 ALIASES = {
@@ -294,3 +303,33 @@ ALIASES = {
 	"suzanne aubert": "suzanne aubert catholic school",
 }
 # --- END AUTO-GENERATED ---
+
+# The built-in table (room_rate_raw plus ALIASES) is compiled once into room_rate_snapshot.bin;
+# regenerate it with `python room_rate.py` after editing either. The snapshot is tagged with a digest
+# of its inputs and ignored when that no longer matches, so a stale one costs a compile, never wrong rates.
+RATE_SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "room_rate_snapshot.bin")
+
+def room_rates_from_csv(lines):
+    """Compile the embedded CSV rows (header first) and ALIASES into a RateTable."""
+    rows = list(csv.reader(lines))[1:]
+    tutors, schools, rates = zip(*rows) if rows else ((), (), ())
+    return rate_table.compile_rates(tutors, schools, rates, aliases=ALIASES)
+
+def rate_source_digest():
+    h = hashlib.sha256("\n".join(room_rate_raw).encode("utf-8"))
+    h.update(repr(sorted(ALIASES.items())).encode("utf-8"))
+    return h.hexdigest()
+
+def write_rate_snapshot(path=RATE_SNAPSHOT_FILE):
+    """Regenerate room_rate_snapshot.bin from room_rate_raw and ALIASES."""
+    room_rates_from_csv(room_rate_raw).save(path, source=rate_source_digest())
+    return path
+
+BUILTIN_RATES = rate_table.RateTable.load(RATE_SNAPSHOT_FILE, source=rate_source_digest()) or room_rates_from_csv(room_rate_raw)
+
+# Dict views of the built-in table for older callers; lookups should go through BUILTIN_RATES
+ROOM_RATES = BUILTIN_RATES.rates_dict()
+ROOM_RATES_BY_TUTOR = BUILTIN_RATES.by_tutor_dict()
+
+if __name__ == "__main__":
+    print(f"Wrote {write_rate_snapshot()}")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Synthetic franchise frames and event sheets at load-testing scale.
+
+The franchise frame (the MusiqHub Dashboard's data) and event-sheet lesson rows are drawn with
+vectorized sampling from a seeded numpy Generator, in chunks, so tens of millions of rows can be
+generated and written as CSV, xlsx or Parquet without holding them in memory at once.
+
+Examples:
+	python synthetic_data.py franchise --rows 20000000 --franchisees 5000 --output fixtures/franchise.parquet
+	python synthetic_data.py events --rows 1000000 --month 2025-02 --output fixtures/2025-02.xlsx
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from event_loader import EXPECTED_COLUMNS
+from franchise_cube import DIMENSIONS, MEASURES
+import synthetic_events
+
+CHUNK_ROWS = int(os.environ.get("MUSIQHUB_SYNTHETIC_CHUNK_ROWS", "1000000"))
+XLSX_MAX_ROWS = 1_048_576  # per worksheet, header rows included
+
+FRANCHISEES = ["Bob Smith", "Alice Johnson", "Tom Lee", "Sophie Wright", "David Brown", "Emma Green", "Chris Adams", "Laura Hill", "James Fox", "Nina Wood"]
+SCHOOLS = ["Mt Roskill Grammar", "Epsom Girls Grammar", "Avondale College", "Lynfield College", "Onehunga High", "Auckland Grammar", "St Cuthbert's", "Baradene College", "Western Springs College", "Selwyn College"]
+YEARS = [2022, 2023, 2024]
+TERMS = ["Term 1", "Term 2", "Term 3", "Term 4"]
+INSTRUMENTS = ["Guitar", "Piano", "Drums", "Violin", "Flute"]
+FRANCHISE_COLUMNS = DIMENSIONS + MEASURES
+
+
+def _names(base, n, label):
+	# The real-looking names first, then numbered ones once they run out
+	return list(base[:n]) + [f"{label} {i + 1:05d}" for i in range(len(base), n)]
+
+
+def _categorical(codes, names):
+	# Categories sorted by name, so filters and rollups list them alphabetically
+	names = np.asarray(names, dtype=object)
+	order = np.argsort(names, kind="stable")
+	rank = np.empty(len(order), dtype=np.int32)
+	rank[order] = np.arange(len(order), dtype=np.int32)
+	return pd.Categorical.from_codes(rank[codes], categories=names[order])
+
+
+def franchise_chunks(n_rows=None, chunk_rows=CHUNK_ROWS, seed=42, n_franchisees=10, n_schools=10, schools_per_franchisee=2, years=YEARS):
+	"""Franchise rows in chunks of up to chunk_rows.
+
+	Rows walk the grid franchisee x school x year x term x instrument, where franchisee f teaches
+	at schools_per_franchisee consecutive schools starting at f * schools_per_franchisee (mod
+	n_schools). n_rows defaults to one row per grid cell and wraps around the grid when larger.
+	Each chunk draws from its own generator spawned from seed, so a (seed, chunk_rows) pair
+	always yields the same rows.
+	"""
+	franchisees = _names(FRANCHISEES, n_franchisees, "Franchisee")
+	schools = _names(SCHOOLS, n_schools, "School")
+	shape = (n_franchisees, schools_per_franchisee, len(years), len(TERMS), len(INSTRUMENTS))
+	grid = int(np.prod(shape))
+	n_rows = grid if n_rows is None else n_rows
+	starts = range(0, n_rows, max(1, chunk_rows))
+	for start, child in zip(starts, np.random.SeedSequence(seed).spawn(len(starts))):
+		rng = np.random.default_rng(child)
+		cells = np.arange(start, min(start + chunk_rows, n_rows), dtype=np.int64) % grid
+		f, k, y, t, i = np.unravel_index(cells, shape)
+		n = len(cells)
+		students = rng.integers(1, 6, n, dtype=np.int32)
+		avg_revenue = rng.uniform(25, 50, n)
+		lifetime_revenue = avg_revenue * students * rng.integers(3, 8, n)
+		yield pd.DataFrame({
+			"Franchisee": _categorical(f, franchisees),
+			"School": _categorical((f * schools_per_franchisee + k) % n_schools, schools),
+			"Year": np.asarray(years, dtype=np.int16)[y],
+			"Term": _categorical(t, TERMS),
+			"Instrument": _categorical(i, INSTRUMENTS),
+			"Student Count": students,
+			"Lesson Count": students * rng.integers(4, 10, n, dtype=np.int32),
+			"New Enrolments": rng.integers(0, 3, n, dtype=np.int32),
+			"Cancellations": rng.integers(0, 3, n, dtype=np.int32),
+			"Avg Revenue": avg_revenue,
+			"Lifetime Revenue": lifetime_revenue,
+			"Gross Profit": lifetime_revenue * 0.65,
+		})
+
+
+def franchise_frame(n_rows=None, seed=42, **grid):
+	"""The whole franchise frame at once (one chunk); see franchise_chunks for the parameters."""
+	chunks = list(franchise_chunks(n_rows, chunk_rows=n_rows or sys.maxsize, seed=seed, **grid))
+	return chunks[0] if len(chunks) == 1 else pd.DataFrame(columns=FRANCHISE_COLUMNS)
+
+
+def _cell(value):
+	return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def write_fixture(path, chunks, columns, title=None):
+	"""Stream chunks to path as .csv, .xlsx or .parquet (by suffix) and return the data rows written.
+
+	CSV and xlsx get an optional title row, then a header row of columns, then the data: the raw
+	layout of a Drive event sheet, or a plain table when title is None. Parquet gets one row group
+	per chunk under the given column names (the title is not stored).
+	"""
+	suffix = os.path.splitext(str(path))[1].lower()
+	preamble = ([[title] + [None] * (len(columns) - 1)] if title else []) + [list(columns)]
+	rows = 0
+	if suffix == ".csv":
+		with open(path, "w", newline="", encoding="utf-8") as f:
+			csv.writer(f).writerows(preamble)
+			for chunk in chunks:
+				chunk.to_csv(f, header=False, index=False)
+				rows += len(chunk)
+	elif suffix == ".xlsx":
+		from openpyxl import Workbook
+
+		wb = Workbook(write_only=True)
+		ws = wb.create_sheet("Events" if title else "Data")
+		for row in preamble:
+			ws.append(row)
+		for chunk in chunks:
+			if rows + len(chunk) + len(preamble) > XLSX_MAX_ROWS:
+				# Finish the half-written sheet stream before giving up; nothing is saved to path
+				ws.close()
+				raise ValueError(f"xlsx worksheets hold at most {XLSX_MAX_ROWS:,} rows; write CSV or Parquet instead")
+			for row in chunk.itertuples(index=False, name=None):
+				ws.append([_cell(v) for v in row])
+			rows += len(chunk)
+		wb.save(path)
+	elif suffix == ".parquet":
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+
+		writer = None
+		try:
+			for chunk in chunks:
+				table = pa.Table.from_pandas(chunk.set_axis(list(columns), axis=1), schema=writer.schema if writer else None, preserve_index=False)
+				if writer is None:
+					writer = pq.ParquetWriter(str(path), table.schema)
+				writer.write_table(table)
+				rows += len(chunk)
+		finally:
+			if writer is not None:
+				writer.close()
+	else:
+		raise ValueError(f"Unsupported fixture format: {path} (use .csv, .xlsx or .parquet)")
+	return rows
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description="Write synthetic franchise or event-sheet fixtures for load tests.")
+	parser.add_argument("kind", choices=["franchise", "events"])
+	parser.add_argument("--output", required=True, help="Fixture path ending in .csv, .xlsx or .parquet")
+	parser.add_argument("--rows", type=int, help="Rows to write (franchise default: one per grid cell; events default: 10000)")
+	parser.add_argument("--seed", type=int, default=42)
+	parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows generated and written per step")
+	parser.add_argument("--franchisees", type=int, default=10, help="franchise: number of franchisees")
+	parser.add_argument("--schools", type=int, default=10, help="franchise: number of schools")
+	parser.add_argument("--month", default="2025-02", help="events: YYYY-MM of the sheet")
+	parser.add_argument("--tutor", help="events: tutor name (default: drawn from the room-rate table)")
+	return parser.parse_args(argv)
+
+
+def main(argv=None):
+	args = parse_args(argv)
+	start = time.perf_counter()
+	if args.kind == "franchise":
+		chunks = franchise_chunks(args.rows, args.chunk_rows, args.seed, n_franchisees=args.franchisees, n_schools=args.schools)
+		rows = write_fixture(args.output, chunks, FRANCHISE_COLUMNS)
+	else:
+		chunks = synthetic_events.event_chunks(args.rows or 10_000, args.chunk_rows, args.seed, month=args.month, tutor=args.tutor)
+		rows = write_fixture(args.output, chunks, EXPECTED_COLUMNS, title=f"Events {args.month}")
+	print(f"{rows:,} rows written to {args.output} in {time.perf_counter() - start:.1f}s")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
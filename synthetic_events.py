@@ -0,0 +1,129 @@
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from event_loader import EXPECTED_COLUMNS
+from room_rate import BUILTIN_RATES
+
+# Synthetic event sheets shaped like the monthly Drive exports: a title row, the header row, then
+# lesson slots whose Event Date / Duration / Description appear only on the first row of the slot
+# (group lessons list one student per row below it), plus a sprinkling of blank student rows.
+# School names come from the real room-rate table in canonical, alias and misspelt forms so the
+# rate lookups hit their exact, alias and fuzzy paths in realistic proportions.
+
+SLOT_SIZES = np.array([1, 1, 1, 1, 2, 2, 3, 4, 6])
+DURATIONS = np.array([30, 30, 45, 60])
+BILLED_AMOUNTS = np.array([0.0, 18.0, 20.5, 22.0, 25.0, 28.0, 32.0, 36.0, 40.0])
+STATUSES = np.array(["Attended", "Attended", "Attended", "Attended", "Cancelled", "No Show"], dtype=object)
+
+
+def _misspell(name, rng):
+	if len(name) < 6:
+		return name
+	i = int(rng.integers(1, len(name) - 1))
+	return name[:i] + name[i + 1:]
+
+
+def school_names(rng, canonical=0.8, alias=0.15):
+	"""Description values to draw from, weighted canonical / alias / misspelt."""
+	names = [n.title() for n in BUILTIN_RATES.schools[BUILTIN_RATES.has_rate]]
+	aliases = [a.title() for a in BUILTIN_RATES.alias_names] or names
+	misspelt = [_misspell(n, rng) for n in names]
+	pool = np.array(names + aliases + misspelt, dtype=object)
+	weights = np.concatenate([
+		np.full(len(names), canonical / len(names)),
+		np.full(len(aliases), alias / len(aliases)),
+		np.full(len(misspelt), (1 - canonical - alias) / len(misspelt)),
+	])
+	return pool, weights / weights.sum()
+
+
+def tutor_names():
+	tutors = [t for t in BUILTIN_RATES.tutors if t]
+	return [t.title() for t in tutors] or ["Jordan Morrison"]
+
+
+def event_header(month="2025-02"):
+	"""The title and column-header rows that open a raw event sheet."""
+	return pd.DataFrame([[f"Events {month}"] + [None] * 9, EXPECTED_COLUMNS], columns=range(10))
+
+
+def event_body(n_lessons, rng, blank_ratio=0.03, month="2025-02", tutor=None):
+	"""n_lessons raw lesson rows (no header) drawn from rng; the tutor is drawn too when None."""
+	# Slot sizes drawn up front; enough slots to cover n rows, then trimmed
+	sizes = rng.choice(SLOT_SIZES, size=max(1, n_lessons))
+	slot = np.repeat(np.arange(len(sizes)), sizes)[:n_lessons]
+	n_slots = int(slot[-1]) + 1 if n_lessons else 0
+	first = np.ones(n_lessons, dtype=bool)
+	first[1:] = slot[1:] != slot[:-1]
+
+	year, mon = (int(p) for p in month.split("-"))
+	base = np.datetime64(datetime(year, mon, 1, 8))
+	minutes = rng.integers(0, 27 * 24 * 60 // 15, size=n_slots) * 15
+	slot_dates = (base + minutes.astype("timedelta64[m]")).astype("datetime64[us]").astype(object)
+	pool, weights = school_names(rng)
+	slot_schools = rng.choice(pool, size=n_slots, p=weights)
+	slot_durations = rng.choice(DURATIONS, size=n_slots).astype(object)
+
+	def per_slot(values):
+		col = np.full(n_lessons, None, dtype=object)
+		col[first] = values[slot[first]]
+		return col
+
+	if tutor is None:
+		tutors = tutor_names()
+		tutor = tutors[int(rng.integers(len(tutors)))]
+	n_students = max(10, n_lessons // 8)
+	student_ids = rng.integers(0, n_students, size=n_lessons)
+	students = np.char.add("Student ", student_ids.astype(str)).astype(object)
+	blank = rng.random(n_lessons) < blank_ratio
+	students[blank] = None
+	billed = rng.choice(BILLED_AMOUNTS, size=n_lessons)
+
+	rows = pd.DataFrame({
+		0: per_slot(slot_dates),
+		1: per_slot(slot_durations),
+		2: per_slot(slot_schools),
+		3: np.full(n_lessons, tutor, dtype=object),
+		4: (billed * 0.6).round(2),
+		5: students,
+		6: np.char.add("Family ", (student_ids // 2).astype(str)).astype(object),
+		7: rng.choice(STATUSES, size=n_lessons),
+		8: (billed / 1.15).round(2),
+		9: billed,
+	}, dtype=object)
+	return rows
+
+
+def event_rows(n_lessons, seed=0, blank_ratio=0.03, month="2025-02", tutor=None):
+	"""Raw event sheet as pd.read_excel(..., header=None) returns it, with n_lessons student rows."""
+	body = event_body(n_lessons, np.random.default_rng(seed), blank_ratio, month, tutor)
+	return pd.concat([event_header(month), body], ignore_index=True)
+
+
+def event_chunks(n_lessons, chunk_rows, seed=0, blank_ratio=0.03, month="2025-02", tutor=None):
+	"""event_body() in chunks of up to chunk_rows rows, for sheets too large to hold at once.
+
+	Each chunk has its own generator spawned from seed, so a (seed, chunk_rows) pair always yields
+	the same rows; the tutor is drawn once for the whole sheet.
+	"""
+	if tutor is None:
+		tutors = tutor_names()
+		tutor = tutors[int(np.random.default_rng(seed).integers(len(tutors)))]
+	starts = range(0, n_lessons, max(1, chunk_rows))
+	for start, child in zip(starts, np.random.SeedSequence(seed).spawn(len(starts))):
+		yield event_body(min(chunk_rows, n_lessons - start), np.random.default_rng(child), blank_ratio, month, tutor)
+
+
+def workbook_bytes(raw):
+	"""Write a raw event sheet (event_rows) as xlsx and return the bytes."""
+	wb = Workbook(write_only=True)
+	ws = wb.create_sheet("Events")
+	for row in raw.itertuples(index=False, name=None):
+		ws.append([None if isinstance(v, float) and np.isnan(v) else v for v in row])
+	buf = io.BytesIO()
+	wb.save(buf)
+	return buf.getvalue()
@@ -0,0 +1,127 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import frame_fingerprint
+import metrics
+
+# Paginated table for frames too large to send to the browser whole.
+# The frame stays on the server: filtering and sorting produce an array of row positions, memoized
+# per (frame content, filter, sort) in a small LRU, and only the current page of the selected
+# columns is passed to st.dataframe, so the payload is bounded by the page size whatever the
+# frame's length. Frames are recognised by a content fingerprint, so a table rebuilt on every rerun
+# (the history rollups) still hits; it is computed once per frame object (frames are shared and
+# never edited in place).
+
+PAGE_SIZES = [25, 50, 100, 250]
+VIEW_CACHE_SIZE = 16
+HAYSTACK_CACHE_SIZE = 8  # frames whose per-column filter text is kept
+
+_lock = threading.Lock()
+_positions = OrderedDict()
+_haystacks = OrderedDict()
+
+
+def _haystack(df, column):
+	# (codes, lower-cased text of each distinct value) for one column, built once per frame content and
+	# column; a filter then matches the distinct values only and maps the result back through the codes
+	fingerprint = frame_fingerprint.fingerprint(df)
+	with _lock:
+		columns = _haystacks.get(fingerprint)
+		if columns is not None:
+			_haystacks.move_to_end(fingerprint)
+			if column in columns:
+				return columns[column]
+	values = df[column]
+	if isinstance(values.dtype, pd.CategoricalDtype):
+		codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+	else:
+		codes, uniques = pd.factorize(values)
+	text = (codes, pd.Series(uniques.astype(str), dtype=object).str.lower())
+	with _lock:
+		_haystacks.setdefault(fingerprint, {})[column] = text
+		_haystacks.move_to_end(fingerprint)
+		while len(_haystacks) > HAYSTACK_CACHE_SIZE:
+			_haystacks.popitem(last=False)
+	return text
+
+
+def _matches(df, column, query):
+	codes, labels = _haystack(df, column)
+	# Blank cells (code -1) never match
+	hit = np.append(labels.str.contains(query, regex=False).to_numpy(dtype=bool), False)
+	return hit[codes]
+
+
+def _sorted_positions(df, positions, sort_by, descending):
+	values = df[sort_by].iloc[positions].reset_index(drop=True)
+	try:
+		order = values.sort_values(ascending=not descending, kind="stable", na_position="last").index.to_numpy()
+	except TypeError:
+		# Mixed types in an object column: sort by their text instead
+		order = values.astype(str).sort_values(ascending=not descending, kind="stable").index.to_numpy()
+	return positions[order]
+
+
+def filter_sort(df, query="", columns=None, sort_by=None, descending=False):
+	"""Row positions of df matching a case-insensitive text filter over columns, in sort order.
+
+	Memoized per (frame content, query, columns, sort); treat the result as read-only.
+	"""
+	columns = tuple(columns if columns is not None else df.columns)
+	query = (query or "").strip().lower()
+	key = (frame_fingerprint.fingerprint(df), query, columns if query else (), sort_by, bool(descending))
+	with _lock:
+		if key in _positions:
+			_positions.move_to_end(key)
+			metrics.cache_result("table_view", True)
+			return _positions[key]
+	metrics.cache_result("table_view", False)
+	with metrics.span("table_view.filter_sort"):
+		positions = np.arange(len(df))
+		if query:
+			matched = np.zeros(len(df), dtype=bool)
+			for column in columns:
+				matched |= _matches(df, column, query)
+			positions = positions[matched]
+		if sort_by is not None:
+			positions = _sorted_positions(df, positions, sort_by, descending)
+	with _lock:
+		_positions[key] = positions
+		while len(_positions) > VIEW_CACHE_SIZE:
+			_positions.popitem(last=False)
+	return positions
+
+
+def paged_dataframe(df, key, hidden=(), page_size=50):
+	"""Render df as a filterable, sortable table that sends one page of the chosen columns per rerun.
+
+	key: unique widget-key prefix. hidden: columns left out of the column choices.
+	"""
+	available = [c for c in df.columns if c not in set(hidden)]
+	filter_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+	query = filter_col.text_input("Filter rows", key=f"{key}_filter", placeholder="Text to search for")
+	sort_by = sort_col.selectbox("Sort by", ["(none)"] + available, key=f"{key}_sort")
+	descending = order_col.toggle("Descending", key=f"{key}_descending")
+	size = size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 1, key=f"{key}_size")
+	columns = st.multiselect("Columns", available, default=available, key=f"{key}_columns")
+	columns = columns or available
+
+	positions = filter_sort(df, query, columns, None if sort_by == "(none)" else sort_by, descending)
+	pages = max(1, math.ceil(len(positions) / size))
+	# A new filter, sort or page size starts again from page 1
+	page_key = f"{key}_page"
+	view = (query, sort_by, descending, size)
+	if st.session_state.get(f"{key}_view") != view:
+		st.session_state[f"{key}_view"] = view
+		st.session_state[page_key] = 1
+	elif st.session_state.get(page_key, 1) > pages:
+		st.session_state[page_key] = pages
+	page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+	start = (page - 1) * size
+	st.caption(f"{len(positions):,} of {len(df):,} rows · page {page:,} of {pages:,}")
+	st.dataframe(df.iloc[positions[start:start + size]][columns], hide_index=True)
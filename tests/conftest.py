@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The app's modules live at the repository root and read their cache locations at import time:
+# point them at a throwaway directory before any test imports them.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MUSIQHUB_CACHE_DIR", tempfile.mkdtemp(prefix="musiqhub-tests-"))
@@ -0,0 +1,66 @@
+import json
+import threading
+
+import batch_report
+import synthetic_events
+from room_rate import BUILTIN_RATES
+
+
+class FakeService:
+	def files(self):
+		raise AssertionError("the manifest metadata should make a files() call unnecessary")
+
+
+class FakeDrivePool:
+	"""Stands in for drive_client.DriveClientPool: serves workbooks by file id and records its callers."""
+
+	def __init__(self, workbooks):
+		self.workbooks = workbooks
+		self.service_threads = []
+		self.downloads = []
+
+	def service(self):
+		self.service_threads.append(threading.get_ident())
+		return FakeService()
+
+	def download(self, file_id, size=None):
+		self.downloads.append(file_id)
+		return self.workbooks[file_id]
+
+
+class FakeManifest:
+	def __init__(self, files):
+		self.files = files  # {(tutor, month): metadata}
+
+	def tutors(self):
+		return sorted({tutor for tutor, _ in self.files})
+
+	def months(self, tutor):
+		return sorted((m for t, m in self.files if t == tutor), reverse=True)
+
+	def resolve(self, tutor, month):
+		return self.files.get((tutor, month))
+
+
+def test_drive_mode_downloads_through_the_drive_pool(tmp_path, monkeypatch):
+	workbooks, files = {}, {}
+	for i, (tutor, month) in enumerate([("Alice Smith", "2025-02"), ("Alice Smith", "2025-03"), ("Bob Jones", "2025-02")]):
+		file_id = f"file-{i}"
+		workbooks[file_id] = synthetic_events.workbook_bytes(synthetic_events.event_rows(40, seed=i))
+		files[(tutor, month)] = {"id": file_id, "md5Checksum": f"md5-{i}", "modifiedTime": "2025-04-01T00:00:00Z", "size": str(len(workbooks[file_id]))}
+	drive_pool = FakeDrivePool(workbooks)
+	monkeypatch.setattr(batch_report.drive_client.DriveClientPool, "from_service_account_file", classmethod(lambda cls, path, **kwargs: drive_pool))
+	monkeypatch.setattr(batch_report.drive_manifest, "get_manifest", lambda factory: FakeManifest(files))
+	monkeypatch.setattr(batch_report.rate_cache, "get_room_rates", lambda *args, **kwargs: BUILTIN_RATES)
+
+	output_dir = tmp_path / "reports"
+	code = batch_report.main(["--service-account", "key.json", "--output-dir", str(output_dir), "--workers", "1"])
+
+	reports = json.loads((output_dir / "summary.json").read_text())["reports"]
+	assert code == 0, reports
+	assert [(r["tutor"], r["month"]) for r in reports] == [("Alice Smith", "2025-02"), ("Alice Smith", "2025-03"), ("Bob Jones", "2025-02")]
+	assert sorted(drive_pool.downloads) == sorted(workbooks)
+	# Each download thread gets its own client; none is made on the main thread and shared
+	assert drive_pool.service_threads and threading.get_ident() not in drive_pool.service_threads
+	for tutor, month in files:
+		assert (output_dir / tutor / f"{tutor}_{month}_Combined_Report.pdf").read_bytes().startswith(b"%PDF")
@@ -0,0 +1,105 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# MusiqHub support-fee tiers.
+# Each schedule is one table: a lesson fee below bounds[i] (and not below bounds[i-1]) falls in
+# tier i + 1 and pays fees[i]; anything from the last bound up is the top tier. Schedules are
+# versioned by the date they take effect, so lessons are priced with the schedule in force on
+# the lesson date. Add a new entry (sorted by effective_from) when the fee table changes.
+
+TIER_SCHEDULES = [
+	{
+		"effective_from": date(2000, 1, 1),
+		"bounds": np.array([11.51, 13.51, 15.51, 17.51, 20.51, 26.51]),
+		"fees": np.array([1.80, 2.20, 2.60, 3.00, 3.30, 3.60, 4.00]),
+	},
+]
+
+
+def _effective_dates():
+	return np.array([np.datetime64(s["effective_from"], "D") for s in TIER_SCHEDULES])
+
+
+def schedule_for(on_date=None):
+	"""Return the tier schedule in force on on_date (today if None)."""
+	on_date = np.datetime64(on_date or date.today(), "D")
+	idx = max(0, int(np.searchsorted(_effective_dates(), on_date, side="right")) - 1)
+	return TIER_SCHEDULES[idx]
+
+
+def tier_numbers(on_date=None):
+	"""Return the list of tier numbers (1..N) for the schedule in force on on_date."""
+	return list(range(1, len(schedule_for(on_date)["fees"]) + 1))
+
+
+def tier_fee(tier, on_date=None):
+	"""Return the support fee for a tier number."""
+	return float(schedule_for(on_date)["fees"][int(tier) - 1])
+
+
+def tier_fee_cents(tier, on_date=None):
+	"""tier_fee() in int64 cents."""
+	return int(_in_cents(schedule_for(on_date))[1][int(tier) - 1])
+
+
+def _in_cents(schedule):
+	return np.round(schedule["bounds"] * 100).astype(np.int64), np.round(schedule["fees"] * 100).astype(np.int64)
+
+
+def classify(lesson_fees, dates=None):
+	"""Classify a whole column of lesson fees in one np.searchsorted pass.
+
+	lesson_fees: array-like of numbers (NaN is treated as 0).
+	dates: optional array-like of lesson dates, one per fee; rows are priced with the schedule
+	in force on their date (unparseable dates use today's schedule).
+	Returns (tiers, fees) as numpy arrays.
+	"""
+	values = pd.to_numeric(pd.Series(lesson_fees, copy=False), errors="coerce").fillna(0.0).to_numpy(dtype=float)
+	return _classify(values, dates, lambda s: (s["bounds"], s["fees"]), float)
+
+
+def classify_cents(fee_cents, dates=None):
+	"""classify() for int64 cent amounts. Returns (tiers, fees in int64 cents)."""
+	return _classify(np.asarray(fee_cents, dtype=np.int64), dates, _in_cents, np.int64)
+
+
+def _classify(values, dates, table, fee_dtype):
+	if dates is None or len(TIER_SCHEDULES) == 1:
+		# Only one schedule can apply: a single searchsorted over the whole column
+		bounds, fees = table(schedule_for())
+		pos = np.searchsorted(bounds, values, side="right")
+		return pos + 1, fees[pos]
+
+	day = pd.to_datetime(pd.Series(dates, copy=False), errors="coerce").to_numpy(dtype="datetime64[D]")
+	day = np.where(np.isnat(day), np.datetime64(date.today(), "D"), day)
+	schedule_idx = np.maximum(np.searchsorted(_effective_dates(), day, side="right") - 1, 0)
+	tiers = np.empty(len(values), dtype=int)
+	fees = np.empty(len(values), dtype=fee_dtype)
+	# Few schedules, many rows: one searchsorted per schedule over its slice of rows
+	for i in np.unique(schedule_idx):
+		mask = schedule_idx == i
+		bounds, schedule_fees = table(TIER_SCHEDULES[i])
+		pos = np.searchsorted(bounds, values[mask], side="right")
+		tiers[mask] = pos + 1
+		fees[mask] = schedule_fees[pos]
+	return tiers, fees
+
+
+def _check_fee(lesson_fee):
+	if not isinstance(lesson_fee, (int, float, np.integer, np.floating)):
+		raise ValueError(f"Invalid lesson fee: {lesson_fee}. Must be a numeric value.")
+	return float(lesson_fee)
+
+
+def get_tier(lesson_fee, on_date=None):
+	"""Scalar form of classify() for a single lesson fee."""
+	schedule = schedule_for(on_date)
+	return int(np.searchsorted(schedule["bounds"], _check_fee(lesson_fee), side="right")) + 1
+
+
+def get_fee(lesson_fee, on_date=None):
+	"""Scalar form of classify() returning the support fee for a single lesson fee."""
+	schedule = schedule_for(on_date)
+	return float(schedule["fees"][np.searchsorted(schedule["bounds"], _check_fee(lesson_fee), side="right")])
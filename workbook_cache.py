@@ -0,0 +1,203 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+import metrics
+from atomic_file import atomic_write
+from rate_cache import CACHE_DIR
+
+# Content-addressed on-disk cache for downloaded monthly workbooks.
+# Blobs are stored once per md5 under .cache/workbooks/blobs and an index maps each
+# Drive file id to the blob it currently points at, plus the Drive md5Checksum/modifiedTime
+# it was validated against. Within WORKBOOK_FRESH_SECONDS a revisit costs no API call;
+# after that it costs one files.get metadata call, and only a changed file is downloaded.
+
+WORKBOOK_DIR = CACHE_DIR / "workbooks"
+WORKBOOK_CACHE_BUDGET = int(os.environ.get("MUSIQHUB_WORKBOOK_CACHE_MB", "512")) * 1024 * 1024
+WORKBOOK_FRESH_SECONDS = int(os.environ.get("MUSIQHUB_WORKBOOK_FRESH_SECONDS", "60"))
+XLSX_EXPORT_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_lock = threading.Lock()
+_index = None
+
+
+def _index_path():
+	return WORKBOOK_DIR / "index.json"
+
+
+def _blob_path(digest):
+	return WORKBOOK_DIR / "blobs" / f"{digest}.xlsx"
+
+
+def _load_index():
+	global _index
+	if _index is None:
+		try:
+			with open(_index_path(), "r", encoding="utf-8") as f:
+				_index = json.load(f)
+		except (OSError, ValueError):
+			_index = {}
+	return _index
+
+
+def _save_index():
+	path = _index_path()
+	try:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		with atomic_write(path, "w", encoding="utf-8") as f:
+			json.dump(_index, f)
+	except OSError:
+		pass
+
+
+def _version_key(meta):
+	# md5Checksum is only present for binary files; fall back to modifiedTime
+	return meta.get("md5Checksum") or meta.get("modifiedTime")
+
+
+def _read_blob(entry):
+	try:
+		with open(_blob_path(entry["digest"]), "rb") as f:
+			return f.read()
+	except OSError:
+		return None
+
+
+def _write_blob(digest, data):
+	path = _blob_path(digest)
+	if path.exists():
+		return
+	try:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		with atomic_write(path) as f:
+			f.write(data)
+	except OSError:
+		pass
+
+
+def _drop_blob_if_unused(digest):
+	if any(e["digest"] == digest for e in _index.values()):
+		return
+	try:
+		os.remove(_blob_path(digest))
+	except OSError:
+		pass
+
+
+def _evict(budget):
+	# Least recently used first; several file ids may share one blob, so count each blob once
+	sizes = {}
+	for e in _index.values():
+		sizes[e["digest"]] = e["size"]
+	total = sum(sizes.values())
+	for file_id, e in sorted(_index.items(), key=lambda kv: kv[1]["last_used"]):
+		if total <= budget:
+			break
+		del _index[file_id]
+		if not any(other["digest"] == e["digest"] for other in _index.values()):
+			total -= e["size"]
+			_drop_blob_if_unused(e["digest"])
+
+
+def download_file_bytes(service, file_id, chunksize=None):
+	"""Download a Drive file's content with MediaIoBaseDownload and return the bytes."""
+	from googleapiclient.http import MediaIoBaseDownload
+
+	request = service.files().get_media(fileId=file_id)
+	fh = io.BytesIO()
+	if chunksize:
+		downloader = MediaIoBaseDownload(fh, request, chunksize=chunksize)
+	else:
+		downloader = MediaIoBaseDownload(fh, request)
+	done = False
+	while not done:
+		status, done = downloader.next_chunk()
+	return fh.getvalue()
+
+
+def export_file_bytes(service, file_id, mime_type=XLSX_EXPORT_MIME):
+	"""Export a Google-native file (e.g. the room-rate Sheet) and return the bytes."""
+	from googleapiclient.http import MediaIoBaseDownload
+
+	request = service.files().export_media(fileId=file_id, mimeType=mime_type)
+	fh = io.BytesIO()
+	downloader = MediaIoBaseDownload(fh, request)
+	done = False
+	while not done:
+		status, done = downloader.next_chunk()
+	return fh.getvalue()
+
+
+def fetch_workbook(service, file_id, meta=None, fresh_seconds=WORKBOOK_FRESH_SECONDS, budget=WORKBOOK_CACHE_BUDGET, download=None):
+	"""Return the bytes of a Drive workbook, downloading only when its md5Checksum/modifiedTime changed.
+
+	meta may carry md5Checksum/modifiedTime already returned by a files.list call, which
+	saves the revalidation request. download(file_id, size) replaces the single-stream
+	download, e.g. drive_client.DriveClientPool.download for ranged parallel fetches.
+	"""
+	with _lock:
+		_load_index()
+		entry = _index.get(file_id)
+		now = time.time()
+		if entry is not None and meta is None and now - entry["checked_at"] < fresh_seconds:
+			data = _read_blob(entry)
+			if data is not None:
+				entry["last_used"] = now
+				metrics.cache_result("workbook", True)
+				return data
+
+	if meta is None or not _version_key(meta):
+		meta = service.files().get(fileId=file_id, fields="md5Checksum,modifiedTime,size").execute()
+	version = _version_key(meta)
+
+	with _lock:
+		entry = _index.get(file_id)
+		if entry is not None and entry["version"] == version:
+			data = _read_blob(entry)
+			if data is not None:
+				entry["checked_at"] = entry["last_used"] = time.time()
+				_save_index()
+				metrics.cache_result("workbook", True)
+				return data
+
+	metrics.cache_result("workbook", False)
+	with metrics.span("drive.download"):
+		if download is not None:
+			data = download(file_id, meta.get("size"))
+		else:
+			data = download_file_bytes(service, file_id)
+	digest = hashlib.md5(data).hexdigest()
+
+	with _lock:
+		old = _index.get(file_id)
+		now = time.time()
+		_write_blob(digest, data)
+		_index[file_id] = {
+			"digest": digest,
+			"version": version,
+			"size": len(data),
+			"checked_at": now,
+			"last_used": now,
+		}
+		if old is not None and old["digest"] != digest:
+			_drop_blob_if_unused(old["digest"])
+		_evict(budget)
+		_save_index()
+	return data
+
+
+def clear_workbook_cache():
+	"""Forget every cached workbook and delete the blobs from disk."""
+	global _index
+	with _lock:
+		_load_index()
+		for e in list(_index.values()):
+			try:
+				os.remove(_blob_path(e["digest"]))
+			except OSError:
+				pass
+		_index = {}
+		_save_index()